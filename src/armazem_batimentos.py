@@ -0,0 +1,114 @@
+import json
+import struct
+import numpy as np
+from functools import partial
+from ecg_preprocessing import processa_registro, DERIVACOES, PARAMETROS_PIPELINE
+from paralelo import mapeia_em_paralelo
+
+# Formato do arquivo: MAGICO | tamanho do cabeçalho (uint64) | cabeçalho JSON | dados float32
+# Os dados começam em um deslocamento alinhado a 64 bytes, para abertura direta com np.memmap
+MAGICO = b'ECGBEATS'
+ALINHAMENTO = 64
+
+def constroi_armazem(df, arquivo, canais=[6, 7, 8, 9], path='', label=None, cache=None,
+                     n_workers=1, chunksize=None, **parametros):
+    # Extrai os batimentos de todos os registros do DataFrame e grava um único arquivo com
+    # um array float32 contíguo (registros, derivações, batimentos, amostras) e um índice
+    # pequeno com os IDs dos registros, os rótulos e o número de batimentos válidos
+    # label: nome da coluna de rótulos em df (opcional)
+    p = {**PARAMETROS_PIPELINE, **parametros}
+    canais = list(canais)
+
+    processa = partial(processa_registro, canais=canais, cache=cache, **parametros)
+    registros = mapeia_em_paralelo(processa, [path + arquivo for arquivo in df['filename_hr']], n_workers, chunksize)
+
+    # Com n_beats=None (todos os batimentos), o eixo de batimentos tem o tamanho do maior registro
+    n_beats = p['n_beats']
+    if n_beats is None:
+        n_beats = max((len(registro[c][1]) for registro in registros for c in canais), default=0)
+    forma = (len(registros), len(canais), n_beats, p['window_size'])
+    dados = np.zeros(forma, dtype=np.float32)
+    contagens = np.zeros(forma[:2], dtype=np.int64)
+
+    for r, registro in enumerate(registros):
+        for l, canal in enumerate(canais):
+            beats = registro[canal][1]
+            dados[r, l, :len(beats)] = beats
+            contagens[r, l] = len(beats)
+
+    cabecalho = {
+        'forma': forma,
+        'canais': canais,
+        'derivacoes': [DERIVACOES[c] for c in canais],
+        'ids': [str(i) for i in df.index],
+        'arquivos': list(df['filename_hr']),
+        'labels': df[label].tolist() if label is not None else None,
+        'contagens': contagens.tolist(),
+        'parametros': p,
+    }
+    salva_armazem(arquivo, dados, cabecalho)
+    return ArmazemBatimentos(arquivo)
+
+def salva_armazem(arquivo, dados, cabecalho):
+    # Grava cabeçalho + dados no formato descrito em MAGICO
+    texto = json.dumps(cabecalho, default=str).encode()
+    inicio = len(MAGICO) + 8 + len(texto)
+    deslocamento = -(-inicio // ALINHAMENTO) * ALINHAMENTO  # Arredonda para cima
+
+    with open(arquivo, 'wb') as f:
+        f.write(MAGICO)
+        f.write(struct.pack('<Q', len(texto)))
+        f.write(texto)
+        f.write(b'\0' * (deslocamento - inicio))
+        f.write(np.ascontiguousarray(dados, dtype=np.float32).tobytes())
+
+class ArmazemBatimentos:
+    # Armazém de batimentos aberto com np.memmap: nenhum WFDB é lido e os dados só são
+    # copiados para a memória quando acessados
+
+    def __init__(self, arquivo, modo='r'):
+        with open(arquivo, 'rb') as f:
+            if f.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f"{arquivo} não é um armazém de batimentos")
+            tamanho = struct.unpack('<Q', f.read(8))[0]
+            cabecalho = json.loads(f.read(tamanho))
+
+        deslocamento = -(-(len(MAGICO) + 8 + tamanho) // ALINHAMENTO) * ALINHAMENTO
+        self.cabecalho = cabecalho
+        self.canais = cabecalho['canais']
+        self.derivacoes = cabecalho['derivacoes']
+        self.ids = cabecalho['ids']
+        self.arquivos = cabecalho['arquivos']
+        self.labels = np.array(cabecalho['labels']) if cabecalho['labels'] is not None else None
+        self.contagens = np.array(cabecalho['contagens'], dtype=np.int64).reshape(cabecalho['forma'][:2])
+        self.dados = np.memmap(arquivo, dtype=np.float32, mode=modo, offset=deslocamento,
+                               shape=tuple(cabecalho['forma']))
+
+    def __len__(self):
+        return self.dados.shape[0]
+
+    def mascara_validos(self):
+        # Máscara (registros, derivações, batimentos) dos batimentos realmente extraídos
+        return np.arange(self.dados.shape[2]) < self.contagens[:, :, None]
+
+    def batimentos(self, registro, derivacao):
+        # Batimentos válidos de um registro (índice) em uma derivação (nome ou índice)
+        l = self.derivacoes.index(derivacao) if isinstance(derivacao, str) else derivacao
+        return self.dados[registro, l, :self.contagens[registro, l]]
+
+    def prototipos(self, selecao=None):
+        # Template médio por derivação sobre os registros selecionados (máscara booleana,
+        # índices ou um rótulo), equivalente a mean_template dos batimentos concatenados
+        # Sem rótulos, um escalar é o índice de um único registro
+        if selecao is None:
+            selecao = np.ones(len(self), dtype=bool)
+        elif self.labels is not None and np.isscalar(selecao):
+            selecao = self.labels == selecao
+        selecao = np.atleast_1d(selecao)  # Mantém o eixo de registros
+
+        dados = np.asarray(self.dados[selecao], dtype=np.float64)
+        validos = self.mascara_validos()[selecao]
+        soma = np.einsum('rlbs,rlb->ls', dados, validos)
+        contagem = validos.sum(axis=(0, 2))
+
+        return {d: soma[l] / contagem[l] for l, d in enumerate(self.derivacoes)}
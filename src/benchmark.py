@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from dtw_utils import DTW, DTW_vetorizado, DTW_banda, DTW_lote, DTW_dependente, dtw, fastdtw_custom
+from ecg_preprocessing import highpass_filter, notch_filter, bandpass_filter, banco_filtros, processa_registro
+
+def mede_tempo_e_resultado(funcao, *args, repeticoes=3, **kwargs):
+    # Executa a função algumas vezes e retorna o menor tempo observado (em segundos) e o
+    # resultado da última execução, para não repetir a execução só para obtê-lo
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def mede_tempo(funcao, *args, repeticoes=3, **kwargs):
+    # Executa a função algumas vezes e retorna o menor tempo observado (em segundos)
+    return mede_tempo_e_resultado(funcao, *args, repeticoes=repeticoes, **kwargs)[0]
+
+def benchmark_fastdtw(comprimentos=(100, 200, 400, 800, 1600), radius=2, seed=2025):
+    # Compara o tempo do FastDTW com o do DTW exato para séries de comprimento crescente
+    # O FastDTW deve crescer linearmente com o comprimento; o DTW, quadraticamente
+    rng = np.random.default_rng(seed)
+    resultados = []
+
+    for n in comprimentos:
+        # Séries sintéticas do tipo passeio aleatório (mais parecidas com sinais reais que ruído branco)
+        x = np.cumsum(rng.normal(size=n))
+        y = np.cumsum(rng.normal(size=n))
+
+        # O erro relativo usa as distâncias das próprias execuções cronometradas
+        t_fast, d_fast = mede_tempo_e_resultado(fastdtw_custom, x, y, radius=radius)
+        t_dtw, d_dtw = mede_tempo_e_resultado(DTW, x, y, repeticoes=1)
+
+        resultados.append({
+            'n': n,
+            'fastdtw_s': t_fast,
+            'dtw_s': t_dtw,
+            'fastdtw_us_por_amostra': 1e6 * t_fast / n,
+            'erro_relativo': d_fast / d_dtw - 1,
+        })
+
+        print(f"n={n:5d}  FastDTW: {t_fast:.4f}s ({1e6 * t_fast / n:.1f} us/amostra)  "
+              f"DTW: {t_dtw:.4f}s  erro relativo: {resultados[-1]['erro_relativo']:.2%}")
+
+    return resultados
+
+def benchmark_filtros(n_registros=50, n_amostras=5000, canais=4, fs=500, seed=2025):
+    # Compara a vazão por registro dos filtros filtfilt (b, a), projetados a cada chamada,
+    # com a do banco de filtros SOS projetados uma única vez e aplicados em lote
+    rng = np.random.default_rng(seed)
+    sinais = np.cumsum(rng.normal(size=(n_registros, n_amostras, canais)), axis=1)
+    banco = banco_filtros(fs)
+
+    def por_canal():
+        for registro in sinais:
+            for c in range(canais):
+                x = highpass_filter(registro[:, c], fs)
+                x = notch_filter(x, fs)
+                bandpass_filter(x, fs=fs)
+
+    def banco_em_lote():
+        for registro in sinais:
+            x = banco.highpass(registro, axis=0)
+            x = banco.notch(x, axis=0)
+            banco.bandpass(x, axis=0)
+
+    t_canal = mede_tempo(por_canal)
+    t_banco = mede_tempo(banco_em_lote)
+
+    # Diferença máxima entre as duas implementações em um registro
+    x = sinais[0]
+    referencia = np.stack([notch_filter(highpass_filter(x[:, c], fs), fs) for c in range(canais)], axis=1)
+    erro = np.abs(banco.notch(banco.highpass(x, axis=0), axis=0) - referencia).max()
+
+    print(f"filtfilt por canal: {1e3 * t_canal / n_registros:.2f} ms/registro  "
+          f"banco SOS: {1e3 * t_banco / n_registros:.2f} ms/registro  "
+          f"({t_canal / t_banco:.1f}x)  erro máximo: {erro:.2e}")
+
+    return {'filtfilt_ms_por_registro': 1e3 * t_canal / n_registros,
+            'sos_ms_por_registro': 1e3 * t_banco / n_registros,
+            'erro_maximo': erro}
+
+def series_sinteticas(n, quantidade, seed=2025):
+    # Séries sintéticas parecidas com ECG: picos gaussianos quase periódicos (com variação
+    # de ritmo e amplitude) sobre ruído, amostradas em n pontos
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, n)
+    series = []
+    for _ in range(quantidade):
+        periodo = rng.uniform(0.15, 0.3)
+        picos = np.arange(rng.uniform(0, periodo), 1, periodo) + rng.normal(0, 0.01, size=1)
+        x = sum(rng.uniform(0.8, 1.2) * np.exp(-((t - p) / 0.01) ** 2)
+                + 0.3 * np.exp(-((t - p - 0.08) / 0.03) ** 2) for p in picos)
+        series.append(x + rng.normal(0, 0.02, size=n))
+    return np.array(series)
+
+# Lista de registros de treino do repositório (data/ fica ao lado de src/)
+ARQUIVO_TREINO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'X_train.csv')
+
+def series_de_dados(n, quantidade, raiz, arquivo=ARQUIVO_TREINO, canal=6):
+    # Trechos de n amostras do sinal filtrado de registros listados em data/ (requer a
+    # PTB-XL em `raiz`); registros mais curtos que n são ignorados
+    import pandas as pd
+    df = pd.read_csv(arquivo)
+    series = []
+    for nome in df['filename_hr']:
+        sinal = processa_registro(raiz + nome, [canal])[canal][0]
+        if len(sinal) >= n:
+            series.append(sinal[:n])
+        if len(series) == quantidade:
+            break
+    return np.array(series)
+
+# Motores avaliados: nome -> (função(x, y, parâmetro), nome do parâmetro, valores, n máximo)
+# O n máximo evita combinações inviáveis: as DPs em Python puro (DTW, dtw) levam segundos
+# por par já em n = 500, e DTW_vetorizado guarda a matriz completa em memória; motores com
+# n máximo são medidos em uma única execução. DTW_lote é tratado à parte por receber o
+# lote inteiro de uma vez
+MOTORES = {
+    'DTW': (lambda x, y, _: DTW(x, y), None, [None], 200),
+    'dtw': (lambda x, y, w: dtw(x, y, window=w), 'window', [None, 0.1], 200),
+    'DTW_vetorizado': (lambda x, y, _: DTW_vetorizado(x, y), None, [None], 2000),
+    'DTW_banda': (lambda x, y, f: DTW_banda(x, y, fracao=f), 'fracao', [None, 0.05, 0.1, 0.2], None),
+    'fastdtw_custom': (lambda x, y, r: fastdtw_custom(x, y, radius=r), 'radius', [1, 2, 5], None),
+}
+
+# Memória máxima (bytes) permitida para o tensor de DTW_lote
+LIMITE_MEMORIA_LOTE = 512 * 1024 ** 2
+
+def _pico_memoria(funcao):
+    # Pico de memória (KiB) alocada durante uma execução da função
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def benchmark_motores(comprimentos=(100, 200, 500, 1000, 2000, 5000), lotes=(1, 4, 16),
+                      repeticoes=3, seed=2025, raiz=None, saida=None):
+    # Compara os motores de DTW por comprimento de série, janela/raio e tamanho de lote
+    # Para cada combinação mede: tempo por lote, pares por segundo, células de DP por segundo
+    # (n² para DTW completo), pico de memória e erro relativo em relação ao DTW exato
+    # O erro usa as distâncias da execução cronometrada; o pico de memória exige uma execução
+    # extra, de um único par, porque o tracemalloc deixa o código mais lento
+    # raiz: caminho da PTB-XL para usar trechos de registros de data/ em vez de séries sintéticas
+    resultados = []
+
+    for n in comprimentos:
+        maior_lote = max(lotes)
+        if raiz is not None:
+            series = series_de_dados(n, 2 * maior_lote, raiz)
+        else:
+            series = series_sinteticas(n, 2 * maior_lote, seed)
+        consultas, referencias = series[:maior_lote], series[maior_lote:2 * maior_lote]
+
+        # Referência exata (DTW_banda sem banda é exato e tem memória O(n))
+        exatas = np.array([DTW_banda(x, y) for x, y in zip(consultas, referencias)])
+
+        for lote in lotes:
+            pares = list(zip(consultas[:lote], referencias[:lote]))
+
+            for motor, (funcao, nome_parametro, valores, n_max) in MOTORES.items():
+                if n_max is not None and n > n_max:
+                    continue
+                for valor in valores:
+                    # A janela de dtw é dada em amostras; converte a fração para amostras
+                    parametro = int(valor * n) if motor == 'dtw' and valor is not None else valor
+                    executa = lambda: [funcao(x, y, parametro) for x, y in pares]
+
+                    tempo, distancias = mede_tempo_e_resultado(executa, repeticoes=1 if n_max else repeticoes)
+                    distancias = np.array(distancias)
+                    if motor == 'dtw':
+                        erro = None  # dtw usa custo absoluto sem raiz: métrica diferente do DTW
+                    else:
+                        erro = float(np.max(np.abs(distancias / exatas[:lote] - 1)))
+
+                    resultados.append({
+                        'motor': motor, 'n': n, 'lote': lote,
+                        'parametro': nome_parametro, 'valor': valor,
+                        'tempo_s': tempo,
+                        'pares_por_s': lote / tempo,
+                        'celulas_por_s': lote * n * n / tempo,
+                        'memoria_pico_kib': _pico_memoria(lambda: funcao(*pares[0], parametro)),
+                        'erro_relativo_max': erro,
+                    })
+
+            # DTW_lote: uma consulta contra `lote` referências em uma única chamada
+            if lote * (n + 1) ** 2 * 16 <= LIMITE_MEMORIA_LOTE:
+                executa = lambda: DTW_lote(consultas[0], referencias[:lote, None, :])
+                tempo, distancias = mede_tempo_e_resultado(executa, repeticoes=repeticoes)
+                distancias = distancias[:, 0]
+                exatas_lote = np.array([DTW_banda(consultas[0], y) for y in referencias[:lote]])
+                resultados.append({
+                    'motor': 'DTW_lote', 'n': n, 'lote': lote, 'parametro': None, 'valor': None,
+                    'tempo_s': tempo,
+                    'pares_por_s': lote / tempo,
+                    'celulas_por_s': lote * n * n / tempo,
+                    'memoria_pico_kib': _pico_memoria(executa),
+                    'erro_relativo_max': float(np.max(np.abs(distancias / exatas_lote - 1))),
+                })
+
+        for r in resultados:
+            if r['n'] == n:
+                erro = '-' if r['erro_relativo_max'] is None else f"{r['erro_relativo_max']:.2e}"
+                parametro = f"{r['parametro']}={r['valor']}" if r['parametro'] else ''
+                print(f"{r['motor']:>15} n={n:5d} lote={r['lote']:3d} {parametro:>12}  "
+                      f"{r['tempo_s']:.4f}s  {r['pares_por_s']:.1f} pares/s  "
+                      f"{r['memoria_pico_kib']:.0f} KiB  erro: {erro}")
+
+    if saida is not None:
+        salva_json(resultados, saida)
+    return resultados
+
+def benchmark_dependente(n=200, derivacoes=(1, 4, 12), classes=2, repeticoes=3, seed=2025):
+    # Compara o DTW independente (DTW_lote, uma DP por derivação) com o dependente
+    # (DTW_dependente, uma DP por protótipo) para um batimento contra `classes` protótipos
+    rng = np.random.default_rng(seed)
+    resultados = []
+
+    for d in derivacoes:
+        consulta = np.cumsum(rng.normal(size=(n, d)), axis=0)
+        referencias = np.cumsum(rng.normal(size=(classes, n, d)), axis=0)
+
+        tempo_independente = mede_tempo(DTW_lote, consulta.T, referencias.transpose(0, 2, 1), repeticoes=repeticoes)
+        tempo_dependente = mede_tempo(DTW_dependente, consulta, referencias, repeticoes=repeticoes)
+        resultados.append({'derivacoes': d, 'independente_s': tempo_independente,
+                           'dependente_s': tempo_dependente,
+                           'ganho': tempo_independente / tempo_dependente})
+        print(f"{d:3d} derivações  independente: {tempo_independente:.4f}s  "
+              f"dependente: {tempo_dependente:.4f}s  ganho: {tempo_independente / tempo_dependente:.1f}x")
+
+    return resultados
+
+def salva_json(resultados, arquivo):
+    # Salva os resultados com metadados do ambiente, para comparar versões
+    documento = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'processador': platform.processor(),
+        'cpus': os.cpu_count(),
+        'resultados': resultados,
+    }
+    with open(arquivo, 'w') as f:
+        json.dump(documento, f, indent=2)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark dos motores de DTW')
+    parser.add_argument('--comprimentos', type=int, nargs='+', default=[100, 200, 500, 1000, 2000, 5000])
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--raiz', default=None, help='caminho da PTB-XL (usa registros de data/)')
+    parser.add_argument('--saida', default='benchmark_dtw.json', help='arquivo JSON de saída')
+    parser.add_argument('--filtros', action='store_true', help='executa também o benchmark de filtros')
+    parser.add_argument('--dependente', action='store_true', help='compara DTW independente e dependente')
+    args = parser.parse_args()
+
+    benchmark_motores(args.comprimentos, args.lotes, args.repeticoes, raiz=args.raiz, saida=args.saida)
+    if args.filtros:
+        benchmark_filtros()
+    if args.dependente:
+        benchmark_dependente()
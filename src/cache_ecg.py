@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+class CacheECG:
+    # Cache em disco (arquivos .npz) dos sinais filtrados e batimentos extraídos
+    # A chave é derivada do caminho do registro e dos parâmetros do pipeline, de modo que
+    # uma mudança em qualquer parâmetro de pré-processamento gere uma nova entrada
+    # O tamanho total é limitado: ao ultrapassar tamanho_max_mb, as entradas usadas há mais
+    # tempo são removidas (LRU, pela data de modificação dos arquivos)
+    # O tamanho total é mantido em memória e atualizado a cada gravação; o diretório só é
+    # varrido na criação e quando o total passa do limite, e a remoção vai até uma folga
+    # abaixo dele, para que gravações seguidas não varram o diretório de novo a cada vez
+
+    FOLGA = 0.9  # Fração do limite que sobra ocupada depois de uma remoção
+
+    def __init__(self, diretorio='cache_ecg', tamanho_max_mb=1024):
+        self.diretorio = diretorio
+        self.tamanho_max = int(tamanho_max_mb * 1024 * 1024)
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        os.makedirs(diretorio, exist_ok=True)
+        self.tamanho = sum(tamanho for _, tamanho, _ in self._entradas())
+
+    def chave(self, caminho, **parametros):
+        # Gera a chave a partir do caminho absoluto do registro, da data de modificação do
+        # cabeçalho WFDB (se existir) e dos parâmetros do pipeline
+        caminho = os.path.abspath(caminho)
+        cabecalho = caminho + '.hea'
+        mtime = os.path.getmtime(cabecalho) if os.path.exists(cabecalho) else None
+        conteudo = json.dumps({'caminho': caminho, 'mtime': mtime, **parametros},
+                              sort_keys=True, default=str)
+        return hashlib.sha1(conteudo.encode()).hexdigest()
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + '.npz')
+
+    def obter(self, chave):
+        # Retorna o dicionário de arrays salvo para a chave ou None se não houver entrada
+        arquivo = self._arquivo(chave)
+        try:
+            with np.load(arquivo) as dados:
+                resultado = {nome: dados[nome] for nome in dados.files}
+        except (FileNotFoundError, OSError, ValueError):
+            self.falhas += 1
+            return None
+
+        os.utime(arquivo)  # Marca a entrada como usada recentemente
+        self.acertos += 1
+        return resultado
+
+    def salvar(self, chave, arrays):
+        # Grava os arrays em um .npz (via arquivo temporário, para não deixar entradas
+        # corrompidas se o processo for interrompido) e aplica o limite de tamanho
+        arquivo = self._arquivo(chave)
+        temporario = arquivo + f'.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as f:
+            np.savez(f, **arrays)
+        try:
+            self.tamanho -= os.path.getsize(arquivo)  # Entrada sobrescrita
+        except FileNotFoundError:
+            pass
+        self.tamanho += os.path.getsize(temporario)
+        os.replace(temporario, arquivo)
+        if self.tamanho > self.tamanho_max:
+            self._aplica_limite()
+
+    def _entradas(self):
+        # (mtime, tamanho, nome) de cada entrada do diretório
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith('.npz'):
+                try:
+                    info = os.stat(os.path.join(self.diretorio, nome))
+                except FileNotFoundError:
+                    continue  # Removida por outro processo durante a varredura
+                entradas.append((info.st_mtime, info.st_size, nome))
+        return entradas
+
+    def _aplica_limite(self):
+        # Remove as entradas menos recentemente usadas até o cache ocupar FOLGA do limite
+        # A varredura também corrige o total com o que outros processos gravaram ou removeram
+        entradas = self._entradas()
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = self.FOLGA * self.tamanho_max
+        for _, tamanho, nome in sorted(entradas):
+            if total <= alvo:
+                break
+            try:
+                os.remove(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            self.remocoes += 1
+        self.tamanho = total
+
+    def estatisticas(self):
+        # Contadores de acertos, falhas e remoções desde a criação do objeto
+        total = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'taxa_acerto': self.acertos / total if total else 0.0,
+        }
@@ -1,6 +1,8 @@
 from collections import Counter
-from sklearn.metrics import classification_report
-import seaborn as sns
+import numpy as np
+
+# pandas, seaborn, matplotlib e scikit-learn só são importados pelas funções de relatório,
+# para que quem apenas classifica (workers, serviço) não pague o custo de carregá-los
 
 def classificar_com_base_nas_distancias(dist_normal, dist_ami):
   # Inicializa um dicionário vazio para armazenar as classificações por classe
@@ -17,7 +19,12 @@ def classificar_com_base_nas_distancias(dist_normal, dist_ami):
   # Retorna o dicionário com as classificações por classe
   return classificacoes
 
-def votacao_final(classificacoes_por_classe):
+def empate(classificacoes_por_classe):
+    # Indica se a votação entre "NORMAL" e "AMI" terminou empatada
+    contagem = Counter(classificacoes_por_classe.values())
+    return contagem["NORMAL"] == contagem["AMI"]
+
+def votacao_final(classificacoes_por_classe, dist_normal=None, dist_ami=None):
     # Conta quantas vezes cada classe ("NORMAL" ou "AMI") foi atribuída
     contagem = Counter(classificacoes_por_classe.values())
 
@@ -31,8 +38,10 @@ def votacao_final(classificacoes_por_classe):
     
     else:
         # Em caso de empate, realiza um critério de desempate baseado na soma das distâncias
+        # (as distâncias por derivação de cada grupo precisam ser informadas)
+        if dist_normal is None or dist_ami is None:
+            raise ValueError("votação empatada: informe dist_normal e dist_ami para o desempate")
 
-        # [Não verificado] Variáveis externas são usadas aqui sem serem passadas como parâmetros
         # Soma das distâncias totais para cada grupo
         soma_normal = sum(dist_normal.values())
         soma_ami = sum(dist_ami.values())
@@ -40,7 +49,74 @@ def votacao_final(classificacoes_por_classe):
         # Retorna "NORMAL" se a soma das distâncias para o grupo NORMAL for menor; caso contrário, "AMI"
         return "NORMAL" if soma_normal < soma_ami else "AMI"
 
+CLASSES = ('NORMAL', 'AMI')  # Índice da classe = rótulo numérico (0: NORMAL, 1: AMI)
+
+def tensor_distancias(distancias_por_registro, classes=CLASSES, derivacoes=None):
+    # Converte uma lista de {classe: {derivação: distância}} (uma por registro) no array
+    # (registros x classes x derivações) usado por votacao_lote
+    if derivacoes is None:
+        derivacoes = list(distancias_por_registro[0][classes[0]])
+    return np.array([[[d[c][l] for l in derivacoes] for c in classes] for d in distancias_por_registro],
+                    dtype=np.float64)
+
+def votacao_lote(distancias, pesos=None):
+    # Mesma regra de classificar_com_base_nas_distancias + votacao_final, para todos os
+    # registros de uma vez sobre o array de distâncias (registros x classes x derivações):
+    #   - voto por derivação na classe mais próxima (empate de distância: a última classe,
+    #     como em classificar_com_base_nas_distancias);
+    #   - votos somados com pesos por derivação (padrão: 1);
+    #   - empate de votos desfeito pela menor soma de distâncias entre as classes empatadas
+    #     (igualdade: a última classe, como em votacao_final)
+    # pesos pode ter dimensões iniciais extras (variantes x derivações) para avaliar muitas
+    # regras de uma vez; os resultados ganham as mesmas dimensões à frente
+    # Retorna um dicionário com os votos por derivação, os votos por classe, os empates e os
+    # rótulos finais (índices em CLASSES)
+    distancias = np.asarray(distancias, dtype=np.float64)
+    n_classes, n_derivacoes = distancias.shape[1:]
+    if pesos is None:
+        pesos = np.ones(n_derivacoes)
+    pesos = np.asarray(pesos, dtype=np.float64)
+
+    # Última classe de menor distância em cada derivação: (registros x derivações)
+    votos_derivacao = n_classes - 1 - np.argmin(distancias[:, ::-1, :], axis=1)
+    um_quente = votos_derivacao[:, None, :] == np.arange(n_classes)[:, None]   # (registros x classes x derivações)
+    votos = np.einsum('rcl,...l->...rc', um_quente.astype(np.float64), pesos)
+
+    # Classes empatadas com o máximo de votos disputam pela soma das distâncias
+    empatadas = np.isclose(votos, votos.max(axis=-1, keepdims=True))
+    soma = np.where(empatadas, distancias.sum(axis=2), np.inf)
+    rotulos = n_classes - 1 - np.argmin(soma[..., ::-1], axis=-1)
+
+    return {
+        'votos_derivacao': votos_derivacao,
+        'votos': votos,
+        'empate': empatadas.sum(axis=-1) > 1,
+        'rotulos': rotulos,
+    }
+
+def acuracia_regras(distancias, y, pesos):
+    # Acurácia de cada variante de pesos (variantes x derivações) sobre distâncias já
+    # calculadas, sem refazer o DTW; y pode ser vetor, Series ou DataFrame de uma coluna
+    rotulos = votacao_lote(distancias, pesos)['rotulos']
+    return (rotulos == np.asarray(y).ravel()).mean(axis=-1)
+
+def avalia_distancias(distancias, y, pesos=None, graficos=True):
+    # Decide todos os registros por votacao_lote e gera os relatórios de report (e, com
+    # graficos, matriz_confusao); retorna o DataFrame com 'label' e 'predict'
+    import pandas as pd
+
+    rotulos = votacao_lote(distancias, pesos)['rotulos']
+    y_pred = pd.DataFrame({'label': np.asarray(y).ravel(), 'predict': rotulos})
+    if graficos:
+        matriz_confusao(y_pred)
+    report(y_pred['label'], y_pred['predict'])
+    return y_pred
+
 def matriz_confusao(df):
+  import pandas as pd
+  import seaborn as sns
+  from matplotlib import pyplot as plt
+
   # Cria uma matriz de confusão a partir de um DataFrame com colunas 'label' (valor real) e 'predict' (valor previsto)
   matriz_confusao = pd.crosstab(df['label'], df['predict'], rownames=['Atual'], colnames=['Previsto'])
 
@@ -54,7 +130,12 @@ def matriz_confusao(df):
   plt.show()
     
 def report(y_test, y_pred):
+  from sklearn.metrics import classification_report
+
   # Gera e imprime um relatório de classificação contendo:
   # precisão, recall, f1-score e suporte para cada classe
   # target_names especifica os nomes legíveis das classes 0 e 1
-  print(classification_report(y_test, y_pred, target_names=['NORMAL (0)', 'AMI (1)']))
\ No newline at end of file
+  print(classification_report(y_test, y_pred, target_names=['NORMAL (0)', 'AMI (1)']))
+
+  # Também retorna as métricas em dicionário (para comparar configurações)
+  return classification_report(y_test, y_pred, target_names=['NORMAL (0)', 'AMI (1)'], output_dict=True)
\ No newline at end of file
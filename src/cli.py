@@ -0,0 +1,207 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# Ponto de entrada de linha de comando: python cli.py <subcomando> ...
+#   build-templates  constrói os protótipos a partir do treino e salva em .npz
+#   update-templates acrescenta registros rotulados a um acumulador e atualiza os protótipos
+#   classify         classifica registros (ou avalia o conjunto de teste) com protótipos salvos
+#   benchmark        compara os motores de DTW (ver benchmark.py)
+#   startup          mede o tempo de inicialização (importações) de cada subcomando
+# Este módulo só importa a biblioteca padrão; cada subcomando carrega os módulos de que
+# precisa, e gráficos/relatórios (pandas, seaborn, matplotlib, sklearn) só quando usados
+
+# Módulos do projeto carregados por subcomando (e medidos por `startup`)
+MODULOS = {
+    'build-templates': ['main', 'servico_classificacao', 'matriz_distancias'],
+    'update-templates': ['servico_classificacao', 'prototipo_incremental'],
+    'classify': ['main', 'servico_classificacao'],
+    'benchmark': ['benchmark'],
+}
+
+# Dependências pesadas que não devem ser carregadas sem necessidade
+PESADOS = ('pandas', 'matplotlib', 'seaborn', 'sklearn', 'wfdb')
+
+def _importa(comando):
+    return [importlib.import_module(m) for m in MODULOS[comando]]
+
+def build_templates(args):
+    main, servico, matriz_distancias = _importa('build-templates')
+    from functools import partial
+    from cache_ecg import CacheECG
+
+    cache = CacheECG(args.cache) if args.cache else None
+    template = None
+    if args.medoide:
+        template = partial(matriz_distancias.medoid_template, engine=args.engine,
+                           diretorio=args.diretorio_medoide, n_workers=args.n_workers)
+
+    X_train, _, y_train, _ = main.divide_treino_teste(args.raiz, args.random_state, args.cache)
+    if args.acumulador:
+        # Médias acumuladas por partes (memória constante), salvas para atualizações futuras
+        from prototipo_incremental import acumula_registros
+        classes = y_train['label'].map({0: 'NORMAL', 1: 'AMI'})
+        acumulador = acumula_registros(X_train['filename_hr'], classes, path=args.raiz, cache=cache,
+                                       n_workers=args.n_workers)
+        acumulador.salva(args.acumulador)
+        prototipos = acumulador.prototipos()
+    else:
+        prototipos = main.constroi_prototipos(X_train, y_train, args.raiz, cache, args.n_workers,
+                                              args.chunksize, template)
+    servico.salva_prototipos(prototipos, args.saida)
+    print(f'Protótipos de {len(X_train)} registros salvos em {args.saida}')
+
+def update_templates(args):
+    servico, incremental = _importa('update-templates')
+    from cache_ecg import CacheECG
+
+    cache = CacheECG(args.cache) if args.cache else None
+    acumulador = incremental.AcumuladorPrototipos.carrega(args.acumulador)
+    incremental.acumula_registros(args.registros, [args.classe] * len(args.registros), path=args.raiz,
+                                  cache=cache, acumulador=acumulador, n_workers=args.n_workers)
+    acumulador.salva(args.acumulador)
+    servico.salva_prototipos(acumulador.prototipos(), args.saida)
+    print(f'{len(args.registros)} registros acrescentados a {args.classe}; batimentos: {acumulador.contagens()}')
+
+def classify(args):
+    main, servico = _importa('classify')
+    from functools import partial
+    from cache_ecg import CacheECG
+    from dtw_utils import prepara_envelopes
+    from paralelo import mapeia_em_paralelo
+
+    try:
+        if args.representacoes:
+            for fator in args.fatores:
+                main.valida_representacao(args.metodo, fator, True)
+        else:
+            main.valida_representacao(args.metodo, args.fator_paa, args.derivada)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+
+    cache = CacheECG(args.cache) if args.cache else None
+    prototipos = servico.carrega_prototipos(args.prototipos)
+
+    if args.representacoes:
+        # Velocidade x métricas para cada fator de PAA, com e sem Derivative DTW
+        _, X_test, _, y_test = main.divide_treino_teste(args.raiz, args.random_state, args.cache)
+        main.compara_representacoes(X_test, y_test, prototipos, args.raiz, cache, args.fatores,
+                                    metodo=args.metodo, n_workers=args.n_workers, chunksize=args.chunksize)
+        return
+
+    if args.avaliar:
+        # Avaliação no conjunto de teste (carrega os relatórios e gráficos)
+        _, X_test, _, y_test = main.divide_treino_teste(args.raiz, args.random_state, args.cache)
+        main.avalia(X_test, y_test, prototipos, args.raiz, cache, args.metodo, args.n_workers, args.chunksize,
+                    args.salva_distancias, fator_paa=args.fator_paa, usa_derivada=args.derivada)
+        return
+
+    envelopes = prepara_envelopes(prototipos) if args.metodo == 'poda' else None
+    classifica = partial(main.classifica_registro, prototipos=prototipos, path=args.raiz, cache=cache,
+                         metodo=args.metodo, envelopes=envelopes, fator_paa=args.fator_paa,
+                         usa_derivada=args.derivada)
+    resultados = mapeia_em_paralelo(classifica, args.registros, args.n_workers, args.chunksize)
+    for registro, (label, tempo, _) in zip(args.registros, resultados):
+        print(f'{registro}\t{label}\t{1e3 * tempo:.2f} ms')
+
+def benchmark(args):
+    benchmark, = _importa('benchmark')
+    benchmark.benchmark_motores(args.comprimentos, args.lotes, args.repeticoes, raiz=args.raiz, saida=args.saida)
+    if args.filtros:
+        benchmark.benchmark_filtros()
+    if args.dependente:
+        benchmark.benchmark_dependente()
+
+def tempo_inicializacao(comando, repeticoes=5):
+    # Inicia `repeticoes` interpretadores novos que importam os módulos do subcomando e
+    # retorna o menor tempo total do processo, o menor tempo só das importações e as
+    # dependências pesadas carregadas
+    codigo = ('import sys, time; inicio = time.perf_counter(); import cli; cli._importa(%r); '
+              'print(time.perf_counter() - inicio); '
+              'print(" ".join(m for m in cli.PESADOS if m in sys.modules))' % comando)
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    totais, importacoes = [], []
+
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=diretorio, capture_output=True,
+                               text=True, check=True).stdout.splitlines()
+        totais.append(time.perf_counter() - inicio)
+        importacoes.append(float(saida[0]))
+        pesados = saida[1].split() if len(saida) > 1 else []
+
+    return min(totais), min(importacoes), pesados
+
+def startup(args):
+    desconhecidos = set(args.comandos) - set(MODULOS)
+    if desconhecidos:
+        raise SystemExit(f"subcomandos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    for comando in args.comandos or list(MODULOS):
+        total, importacao, pesados = tempo_inicializacao(comando, args.repeticoes)
+        print(f"{comando:<16} processo: {1e3 * total:7.1f} ms  importações: {1e3 * importacao:7.1f} ms  "
+              f"pesados: {', '.join(pesados) or '-'}")
+
+def cria_parser():
+    parser = argparse.ArgumentParser(description='Classificação NORMAL/AMI de ECGs por DTW')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument('--raiz', default='PTB-XL/', help='caminho da PTB-XL')
+    comum.add_argument('--cache', default='cache_ecg', help='diretório do cache ("" desativa)')
+    comum.add_argument('--n-workers', type=int, default=1, help='processos (0 usa todos os núcleos)')
+    comum.add_argument('--chunksize', type=int, default=None)
+    comum.add_argument('--random-state', type=int, default=2025)
+
+    p = sub.add_parser('build-templates', parents=[comum], help='constrói e salva os protótipos')
+    p.add_argument('--saida', default='prototipos.npz')
+    p.add_argument('--medoide', action='store_true', help='usa o medoide por DTW em vez da média')
+    p.add_argument('--engine', default='lote',
+                   help='motor de DTW do medoide (lote e vetorizado são exatos; banda e fastdtw, aproximados)')
+    p.add_argument('--diretorio-medoide', default=None, help='onde guardar as matrizes de distâncias')
+    p.add_argument('--acumulador', default=None, help='constrói por médias acumuladas e salva o acumulador')
+    p.set_defaults(funcao=build_templates)
+
+    p = sub.add_parser('update-templates', parents=[comum], help='acrescenta registros aos protótipos')
+    p.add_argument('registros', nargs='+', help='registros (relativos a --raiz)')
+    p.add_argument('--classe', required=True, choices=['NORMAL', 'AMI'])
+    p.add_argument('--acumulador', required=True, help='acumulador salvo por build-templates --acumulador')
+    p.add_argument('--saida', default='prototipos.npz')
+    p.set_defaults(funcao=update_templates)
+
+    p = sub.add_parser('classify', parents=[comum], help='classifica registros com protótipos salvos')
+    p.add_argument('registros', nargs='*', help='registros (relativos a --raiz)')
+    p.add_argument('--prototipos', default='prototipos.npz')
+    p.add_argument('--metodo', default='dtw', choices=['dtw', 'poda', 'fastdtw', 'dependente'])
+    p.add_argument('--avaliar', action='store_true', help='avalia o conjunto de teste com relatórios')
+    p.add_argument('--fator-paa', type=int, default=1, help='redução por PAA antes do DTW')
+    p.add_argument('--derivada', action='store_true', help='Derivative DTW')
+    p.add_argument('--representacoes', action='store_true',
+                   help='compara velocidade e métricas por fator de PAA, com e sem derivada')
+    p.add_argument('--fatores', type=int, nargs='+', default=[1, 2, 4, 8])
+    p.add_argument('--salva-distancias', default=None,
+                   help='com --avaliar e --metodo dtw, salva as distâncias (registros x classes x derivações)')
+    p.set_defaults(funcao=classify)
+
+    p = sub.add_parser('benchmark', help='compara os motores de DTW')
+    p.add_argument('--comprimentos', type=int, nargs='+', default=[100, 200, 500, 1000])
+    p.add_argument('--lotes', type=int, nargs='+', default=[1, 4, 16])
+    p.add_argument('--repeticoes', type=int, default=3)
+    p.add_argument('--raiz', default=None, help='caminho da PTB-XL (usa registros de data/)')
+    p.add_argument('--saida', default='benchmark_dtw.json')
+    p.add_argument('--filtros', action='store_true')
+    p.add_argument('--dependente', action='store_true')
+    p.set_defaults(funcao=benchmark)
+
+    p = sub.add_parser('startup', help='mede o tempo de inicialização dos subcomandos')
+    p.add_argument('comandos', nargs='*', help=f"subcomandos a medir (padrão: {', '.join(MODULOS)})")
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.set_defaults(funcao=startup)
+
+    return parser
+
+if __name__ == '__main__':
+    args = cria_parser().parse_args()
+    args.funcao(args)
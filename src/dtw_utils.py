@@ -1,11 +1,15 @@
-from fastdtw import fastdtw
-from scipy.spatial.distance import euclidean
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import time
+from functools import partial
 from collections import deque
+from instrumentacao import cronometrado, conta
 
+@cronometrado('dtw')
 def DTW(s, t):
     # Obtém os comprimentos das duas sequências
     n, m = len(s), len(t)
+    conta('celulas_dtw', n * m)
 
     # Inicializa a matriz DTW com infinito, com tamanho (n+1) x (m+1)
     # A posição [0, 0] é inicializada com zero para iniciar o cálculo
@@ -29,10 +33,190 @@ def DTW(s, t):
     
     return dtw_distance
 
+def _acumula_antidiagonais(custo):
+    # Recorrência do DTW sobre uma matriz de custos locais (..., n, m), preenchida uma
+    # anti-diagonal (i + j = k) por vez; dimensões iniciais extras são tratadas como lote
+    n, m = custo.shape[-2:]
+    dtw_matrix = np.full(custo.shape[:-2] + (n+1, m+1), np.inf)
+    dtw_matrix[..., 0, 0] = 0
+
+    # Percorre as anti-diagonais k = i + j, de (1, 1) até (n, m)
+    for k in range(2, n + m + 1):
+        i = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j = k - i
+
+        # Menor custo acumulado entre inserção, deleção e correspondência
+        anterior = np.minimum(
+            np.minimum(dtw_matrix[..., i-1, j], dtw_matrix[..., i, j-1]),
+            dtw_matrix[..., i-1, j-1]
+        )
+        dtw_matrix[..., i, j] = custo[..., i-1, j-1] + anterior
+
+    return np.sqrt(dtw_matrix[..., n, m])
+
+@cronometrado('dtw')
+def DTW_vetorizado(s, t):
+    # Mesma recorrência do DTW acima, mas preenchida uma anti-diagonal (i + j = k) por vez
+    # Todas as células de uma anti-diagonal dependem apenas das duas anteriores,
+    # então cada frente de onda pode ser calculada com operações vetoriais do NumPy
+    s = np.asarray(s, dtype=np.float64).ravel()
+    t = np.asarray(t, dtype=np.float64).ravel()
+    n, m = len(s), len(t)
+    conta('celulas_dtw', n * m)
+
+    # Matriz de custos locais (diferença ao quadrado) calculada de uma só vez
+    custo = (s[:, None] - t[None, :]) ** 2
+    return _acumula_antidiagonais(custo)
+
+@cronometrado('dtw')
+def DTW_lote(consultas, referencias):
+    # DTW em lote: compara uma pilha de batimentos (derivações x amostras) com uma pilha de
+    # protótipos (classes x derivações x amostras) e retorna o tensor (classes x derivações)
+    # A consulta é convertida uma única vez e os custos locais de todos os pares são
+    # calculados juntos; a recorrência segue por anti-diagonais, como em DTW_vetorizado
+    consultas = np.asarray(consultas, dtype=np.float64)
+    referencias = np.asarray(referencias, dtype=np.float64)
+    if consultas.ndim == 1:
+        consultas = consultas[None, :]
+    if referencias.ndim == 2:
+        referencias = referencias[None, :, :]
+    if referencias.shape[1] != consultas.shape[0]:
+        raise ValueError("consultas e referencias devem ter o mesmo número de derivações")
+
+    n, m = consultas.shape[1], referencias.shape[2]
+    lote = referencias.shape[:2]  # (classes, derivações)
+    conta('celulas_dtw', lote[0] * lote[1] * n * m)
+
+    # Custos locais para todos os pares (classe, derivação) de uma só vez
+    custo = (consultas[None, :, :, None] - referencias[:, :, None, :]) ** 2
+    return _acumula_antidiagonais(custo)
+
+@cronometrado('dtw')
+def DTW_dependente(consulta, referencias):
+    # DTW multivariado dependente: alinha um batimento (amostras x derivações) com um ou
+    # mais protótipos ([classes x] amostras x derivações) usando um único caminho de
+    # alinhamento compartilhado por todas as derivações
+    # O custo local de cada célula é a distância euclidiana quadrática entre os vetores de
+    # derivações, calculada de uma só vez; há uma única recorrência por protótipo (e não uma
+    # por derivação, como em DTW_lote), então o custo da programação dinâmica não cresce com
+    # o número de derivações
+    consulta = np.asarray(consulta, dtype=np.float64)
+    referencias = np.asarray(referencias, dtype=np.float64)
+    if consulta.ndim == 1:
+        consulta = consulta[:, None]
+    unico = referencias.ndim < 3
+    if referencias.ndim == 1:
+        referencias = referencias[:, None]
+    if unico:
+        referencias = referencias[None]
+    if referencias.shape[2] != consulta.shape[1]:
+        raise ValueError("consulta e referencias devem ter o mesmo número de derivações")
+
+    n, m = len(consulta), referencias.shape[1]
+    conta('celulas_dtw', len(referencias) * n * m)
+
+    # ||x - y||² = ||x||² + ||y||² - 2 x·y: evita o tensor (classes x n x m x derivações)
+    custo = ((consulta ** 2).sum(axis=1)[None, :, None]
+             + (referencias ** 2).sum(axis=2)[:, None, :]
+             - 2 * np.einsum('id,cjd->cij', consulta, referencias))
+    np.maximum(custo, 0, out=custo)  # Erros de arredondamento podem gerar valores negativos
+
+    distancias = _acumula_antidiagonais(custo)
+    return distancias[0] if unico else distancias
+
+def _largura_banda(n, m, janela=None, fracao=None):
+    # Converte a largura da banda (em amostras ou como fração do comprimento do batimento)
+    # para amostras; a banda nunca é menor que a diferença de comprimento entre as séries
+    if janela is None and fracao is not None:
+        janela = int(round(fracao * max(n, m)))
+    if janela is None:
+        janela = max(n, m)
+    return max(int(janela), abs(n - m))
+
+@cronometrado('dtw')
+def DTW_banda(s, t, janela=None, fracao=None, limite=None, cauda=None):
+    # DTW com banda de Sakoe-Chiba (|i - j| <= janela) que calcula apenas a banda
+    # A recorrência segue linha a linha em coordenadas da banda (coluna o = j - i + janela),
+    # então cada linha é um vetor contíguo de 2·janela + 1 células e o trabalho cresce com a
+    # largura da banda, e não com o comprimento de t. Dentro da linha, a dependência
+    # horizontal D[i, j-1] vira uma soma prefixada seguida de um mínimo acumulado:
+    #   D[i, j] = C[j] + min_{k <= j} (min(D[i-1, k-1], D[i-1, k]) - C[k-1]),  C = custos acumulados
+    # Os custos locais são calculados por blocos de linhas (memória O(janela))
+    # Se limite for informado, o cálculo é abandonado (retorna inf) assim que a distância
+    # com certeza ultrapassar o limite
+    # cauda (opcional, n + 1 valores): cauda[i] é um limite inferior (quadrático) do custo das
+    # linhas i..n-1 de s ainda não alinhadas (ex.: sufixo acumulado do LB_Keogh); torna o
+    # abandono antecipado muito mais cedo
+    s = np.asarray(s, dtype=np.float64).ravel()
+    t = np.asarray(t, dtype=np.float64).ravel()
+    n, m = len(s), len(t)
+    w = _largura_banda(n, m, janela, fracao)
+    largura = 2 * w + 1
+    conta('celulas_dtw', min(n * m, n * largura))
+
+    # t com w zeros de cada lado: a linha i (base 0) da banda é a janela t_pad[i:i + largura]
+    t_pad = np.zeros(max(n, m) + 2 * w)
+    t_pad[w:w + m] = t
+    janelas_t = sliding_window_view(t_pad, largura)
+    limite_quadrado = np.inf if limite is None else limite ** 2
+
+    # Linha anterior e linha atual da banda, com uma célula de inf à direita para o vizinho
+    # vertical da última coluna; na linha 0 só a célula (0, 0) (coluna o = w) vale 0
+    anterior = np.full(largura + 1, np.inf)
+    anterior[w] = 0.0
+    atual = np.full(largura + 1, np.inf)
+    tamanho_bloco = max(1, 2 ** 15 // largura)
+
+    for inicio in range(0, n, tamanho_bloco):
+        fim = min(n, inicio + tamanho_bloco)
+        # Custos do bloco de linhas; células fora da matriz (j < 1 ou j > m) não têm custo
+        # e são excluídas pelo deslocamento infinito
+        j = np.arange(inicio + 1, fim + 1)[:, None] - w + np.arange(largura)
+        dentro = (j >= 1) & (j <= m)
+        custo = np.where(dentro, (s[inicio:fim, None] - janelas_t[inicio:fim]) ** 2, 0.0)
+        acumulado = np.cumsum(custo, axis=1)
+        deslocamento = np.where(dentro, custo - acumulado, np.inf)
+
+        for i in range(fim - inicio):
+            linha = atual[:-1]
+            np.minimum(anterior[:-1], anterior[1:], out=linha)  # (i-1, j-1) e (i-1, j)
+            linha += deslocamento[i]
+            np.minimum.accumulate(linha, out=linha)           # (i, j-1)
+            linha += acumulado[i]
+
+            # Todo caminho passa por todas as linhas e os custos só crescem ao longo dele:
+            # se a linha inteira (somando o que falta de s) já ultrapassa o limite, nenhum
+            # alinhamento pode terminar abaixo dele
+            if limite is not None:
+                restante = 0.0 if cauda is None else cauda[inicio + i + 1]
+                if linha.min() + restante > limite_quadrado:
+                    return np.inf
+            anterior, atual = atual, anterior
+
+    # Célula (n, m): coluna m - n + w da última linha
+    distancia = anterior[m - n + w]
+    if distancia > limite_quadrado:
+        return np.inf
+    return np.sqrt(distancia)
+
+# Motores de DTW disponíveis para calcular_distancias_dtw
+ENGINES = {
+    'classico': DTW,
+    'vetorizado': DTW_vetorizado,
+    # Aproximado: banda de Sakoe-Chiba com 10% do comprimento do batimento
+    'banda': partial(DTW_banda, fracao=0.1),
+}
+
+# Motores que não calculam o DTW exato: a banda restringe o alinhamento, então a distância
+# é maior ou igual à exata (em batimentos desalinhados, dezenas de por cento acima); não
+# são o padrão de nenhuma função e precisam ser pedidos explicitamente
+APROXIMADOS = ('banda',)
+
 def euclidean(a, b):
     # Calcula a distância Euclidiana entre dois vetores unidimensionais
     return np.linalg.norm(np.array(a) - np.array(b))
 
+@cronometrado('dtw')
 def dtw(x, y, window=None):
     # Implementação de DTW com restrição de janela (Sakoe-Chiba Band)
     len_x, len_y = len(x), len(y)
@@ -59,88 +243,167 @@ def dtw(x, y, window=None):
             )
     return dtw_matrix[(len_x - 1, len_y - 1)]
 
+def reduce_by_half(x):
+    # Reduz a série pela metade tirando a média de pares de amostras consecutivas
+    # (se o comprimento for ímpar, a última amostra é mantida sozinha)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x) // 2 * 2
+    reduzida = (x[0:n:2] + x[1:n:2]) / 2
+    if len(x) % 2:
+        reduzida = np.concatenate([reduzida, x[-1:]])
+    return reduzida
+
 def expand_window(path, len_x, len_y, radius):
-    # Expande o caminho de alinhamento para uma janela no espaço original
-    path_set = set(path)
-    window = set()
-
-    for i, j in path:
-        for a in range(-radius, radius + 1):
-            for b in range(-radius, radius + 1):
-                ii, jj = 2 * i + a, 2 * j + b  # projeta para escala maior
-                if 0 <= ii < len_x and 0 <= jj < len_y:
-                    window.add((ii, jj))
-    return window
-
-def constrained_dtw(x, y, window):
-    # Calcula o DTW restrito à janela especificada
-    dtw_matrix = {}
-    for i, j in window:
-        dtw_matrix[(i, j)] = float('inf')
-    dtw_matrix[(-1, -1)] = 0
-
-    # Ordena e percorre os pares da janela para preencher a matriz DTW
-    for i, j in sorted(window):
-        cost = euclidean(x[i], y[j])
-        dtw_matrix[(i, j)] = cost + min(
-            dtw_matrix.get((i-1, j), float('inf')),
-            dtw_matrix.get((i, j-1), float('inf')),
-            dtw_matrix.get((i-1, j-1), float('inf'))
-        )
+    # Projeta o caminho da resolução reduzida para a resolução original e o expande pelo raio
+    # A janela é representada por arrays com a primeira e a última coluna (inclusivas) de cada linha
+    path = np.asarray(path)
+    inicio = np.full(len_x, len_y, dtype=np.int64)
+    fim = np.full(len_x, -1, dtype=np.int64)
 
-    return dtw_matrix[(len(x)-1, len(y)-1)]
+    # Cada célula (i, j) do caminho reduzido cobre o bloco 2x2 (2i..2i+1, 2j..2j+1)
+    for a in (0, 1):
+        linhas = np.minimum(2 * path[:, 0] + a, len_x - 1)
+        np.minimum.at(inicio, linhas, 2 * path[:, 1])
+        np.maximum.at(fim, linhas, np.minimum(2 * path[:, 1] + 1, len_y - 1))
 
+    # Expande pelo raio: cada linha herda o intervalo das linhas vizinhas (±radius), alargado em radius
+    if radius > 0:
+        inicio_pad = np.pad(inicio, radius, constant_values=len_y)
+        fim_pad = np.pad(fim, radius, constant_values=-1)
+        inicio = sliding_window_view(inicio_pad, 2 * radius + 1).min(axis=1) - radius
+        fim = sliding_window_view(fim_pad, 2 * radius + 1).max(axis=1) + radius
 
-def constrained_dtw(x, y, window):
-    dtw_matrix = {}
-    for i, j in window:
-        dtw_matrix[(i, j)] = float('inf')
-    dtw_matrix[(-1, -1)] = 0
-
-    for i, j in sorted(window):
-        cost = euclidean(x[i], y[j])
-        dtw_matrix[(i, j)] = cost + min(
-            dtw_matrix.get((i-1, j), float('inf')),
-            dtw_matrix.get((i, j-1), float('inf')),
-            dtw_matrix.get((i-1, j-1), float('inf'))
-        )
+    return np.clip(inicio, 0, len_y - 1), np.clip(fim, 0, len_y - 1)
 
-    return dtw_matrix[(len(x)-1, len(y)-1)]
+def constrained_dtw(x, y, inicio, fim):
+    # Calcula o DTW restrito à janela [inicio[i], fim[i]] de cada linha i e retorna a
+    # distância e o caminho de alinhamento; x e y têm forma (amostras, dimensões)
+    n, m = len(x), len(y)
+    conta('celulas_dtw', np.sum(fim - inicio + 1))
+    linhas = []
 
-def fastdtw_custom(x, y, radius=1):
-    # Implementação recursiva do FastDTW com raio de restrição
-    min_time_size = radius + 2
+    for i in range(n):
+        a, b = inicio[i], fim[i]
+        custo = ((x[i] - y[a:b+1]) ** 2).sum(axis=1)
+
+        if i == 0:
+            anterior = np.full(b - a + 1, np.inf)
+            anterior[0] = 0 if a == 0 else np.inf   # célula virtual (-1, -1)
+            diagonal = anterior
+            vertical = np.full(b - a + 1, np.inf)
+        else:
+            # Linha anterior com borda de inf, alinhada às colunas a..b da linha atual
+            pa, pb = inicio[i-1], fim[i-1]
+            prev = np.full(b - a + 2, np.inf)
+            lo, hi = max(a - 1, pa), min(b, pb)
+            if lo <= hi:
+                prev[lo - a + 1:hi - a + 2] = linhas[i-1][lo - pa:hi - pa + 1]
+            vertical = prev[1:]      # (i-1, j)
+            diagonal = prev[:-1]     # (i-1, j-1)
 
-    # Se as séries forem curtas, usa DTW exato com janela
-    if len(x) < min_time_size or len(y) < min_time_size:
-        return dtw(x, y, window=radius)
+        # Inserção e correspondência de uma vez; a deleção (i, j-1) exige varrer a linha
+        base = (custo + np.minimum(vertical, diagonal)).tolist()
+        custo = custo.tolist()
+        for jj in range(1, len(base)):
+            base[jj] = min(base[jj], custo[jj] + base[jj-1])
+        linhas.append(np.array(base))
 
-    # Reduz as séries pela metade
-    x_shrink = reduce_by_half(x)
-    y_shrink = reduce_by_half(y)
+    # Reconstrói o caminho a partir de (n-1, m-1)
+    def valor(i, j):
+        if i < 0 or j < 0 or j < inicio[i] or j > fim[i]:
+            return np.inf
+        return linhas[i][j - inicio[i]]
 
-    # Aplica FastDTW recursivamente nas versões reduzidas
-    distance = fastdtw_custom(x_shrink, y_shrink, radius=radius)
+    i, j = n - 1, m - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            i, j = min([(i-1, j-1), (i-1, j), (i, j-1)], key=lambda c: valor(*c))
+        path.append((i, j))
+    path.reverse()
 
-    # Expande a janela com base no caminho presumido (diagonal)
-    window = expand_window(
-        path=[(i, i) for i in range(min(len(x_shrink), len(y_shrink)))],
-        len_x=len(x),
-        len_y=len(y),
-        radius=radius
-    )
+    return np.sqrt(linhas[n-1][m-1 - inicio[n-1]]), path
+
+def _fastdtw(x, y, radius):
+    # Nível recursivo do FastDTW: retorna a distância e o caminho na resolução atual
+    min_time_size = radius + 2
+    n, m = len(x), len(y)
+
+    # Se as séries forem curtas, usa DTW exato (janela cobrindo toda a matriz)
+    if n < min_time_size or m < min_time_size:
+        return constrained_dtw(x, y, np.zeros(n, dtype=np.int64), np.full(n, m - 1))
+
+    # Aplica FastDTW recursivamente nas versões reduzidas e projeta o caminho encontrado
+    _, path = _fastdtw(reduce_by_half(x), reduce_by_half(y), radius)
+    inicio, fim = expand_window(path, n, m, radius)
 
     # Executa DTW restrito à janela expandida
-    return constrained_dtw(x, y, window)
+    return constrained_dtw(x, y, inicio, fim)
+
+@cronometrado('fastdtw')
+def fastdtw_custom(x, y, radius=1, retorna_caminho=False):
+    # Implementação do FastDTW (Salvador & Chan) com raio de restrição
+    # Aceita séries 1-D ou (amostras, dimensões); a distância segue a mesma convenção do DTW
+    # (raiz da soma dos custos quadráticos), de forma que o erro em relação a ele seja comparável
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x = x.reshape(len(x), -1)
+    y = y.reshape(len(y), -1)
+
+    distance, path = _fastdtw(x, y, radius)
+    if retorna_caminho:
+        return distance, path
+    return distance
+
 
+def paa(serie, fator, axis=-1):
+    # Aproximação por agregação em segmentos (PAA): média de cada bloco de `fator` amostras
+    # (o último bloco pode ser menor); reduz o DTW em ~fator² células
+    serie = np.asarray(serie, dtype=np.float64)
+    if fator <= 1:
+        return serie
+    serie = np.moveaxis(serie, axis, -1)
+    n = serie.shape[-1]
+    completos = n // fator * fator
+    reduzida = serie[..., :completos].reshape(serie.shape[:-1] + (-1, fator)).mean(axis=-1)
+    if completos < n:
+        reduzida = np.concatenate([reduzida, serie[..., completos:].mean(axis=-1, keepdims=True)], axis=-1)
+    return np.moveaxis(reduzida, -1, axis)
 
-def calcular_distancias_dtw(batimentos, prototipos, fastDTW=False):
+def derivada(serie, axis=-1):
+    # Estimativa da derivada usada no Derivative DTW (Keogh & Pazzani):
+    # d[i] = ((x[i] - x[i-1]) + (x[i+1] - x[i-1]) / 2) / 2, com as pontas copiadas das vizinhas
+    # O alinhamento passa a comparar a forma (subidas e descidas), não o nível do sinal
+    serie = np.moveaxis(np.asarray(serie, dtype=np.float64), axis, -1)
+    if serie.shape[-1] < 3:
+        return np.moveaxis(np.zeros_like(serie), -1, axis)
+    d = np.empty_like(serie)
+    d[..., 1:-1] = ((serie[..., 1:-1] - serie[..., :-2]) + (serie[..., 2:] - serie[..., :-2]) / 2) / 2
+    d[..., 0] = d[..., 1]
+    d[..., -1] = d[..., -2]
+    return np.moveaxis(d, -1, axis)
+
+def representacao(serie, fator_paa=1, usa_derivada=False, axis=-1):
+    # Representação aplicada antes do DTW: PAA (fator_paa > 1) e, opcionalmente, a derivada
+    serie = paa(serie, fator_paa, axis)
+    return derivada(serie, axis) if usa_derivada else serie
+
+def calcular_distancias_dtw(batimentos, prototipos, fastDTW=False, engine='vetorizado'):
     # Inicialização de variáveis
     inicio = 0        # Marca o início da contagem de tempo para cada par
     fim = 0           # Marca o fim da contagem
     distancias = {}   # Dicionário para armazenar as distâncias DTW por classe
     tempo = []        # Lista para armazenar o tempo de execução por comparação
 
+    # Seleciona o motor de DTW (ver ENGINES)
+    if engine not in ENGINES:
+        raise ValueError(f"engine desconhecido: {engine!r} (opções: {list(ENGINES)})")
+    motor = ENGINES[engine]
+
     # Itera pelas classes presentes no dicionário de batimentos
     for classe in batimentos:
         # Garante que exista um protótipo correspondente para a classe atual
@@ -162,11 +425,156 @@ def calcular_distancias_dtw(batimentos, prototipos, fastDTW=False):
             else:
                 # Mede o tempo de execução para o DTW exato
                 inicio = time.time()
-                dist = DTW(batimentos[classe], prototipos[classe])
+                dist = motor(batimentos[classe], prototipos[classe])
                 fim = time.time()
 
                 distancias[classe] = dist     # Armazena a distância
                 tempo.append(fim - inicio)    # Armazena o tempo de execução
 
     # Retorna o dicionário de distâncias e o tempo médio por comparação
-    return distancias, np.mean(tempo)
\ No newline at end of file
+    return distancias, np.mean(tempo)
+
+def calcular_distancias_dtw_lote(batimentos, prototipos_por_classe, fator_paa=1, usa_derivada=False):
+    # Versão em lote de calcular_distancias_dtw: recebe os batimentos de um registro
+    # ({'V1': ..., 'V2': ...}) e um dicionário {classe: protótipo} e calcula todas as
+    # distâncias em uma única chamada de DTW_lote
+    # fator_paa / usa_derivada: representação aplicada antes do DTW (ver representacao);
+    # com PAA a distância é multiplicada por sqrt(fator_paa), para ficar na escala original
+    classes = list(prototipos_por_classe)
+
+    # Mantém apenas as derivações presentes no registro e em todos os protótipos
+    derivacoes = [d for d in batimentos
+                  if all(d in prototipos_por_classe[c] for c in classes)]
+
+    consultas = np.stack([batimentos[d] for d in derivacoes])
+    referencias = np.stack([
+        np.stack([prototipos_por_classe[c][d] for d in derivacoes]) for c in classes
+    ])
+
+    inicio = time.time()
+    consultas = representacao(consultas, fator_paa, usa_derivada)
+    referencias = representacao(referencias, fator_paa, usa_derivada)
+    matriz = DTW_lote(consultas, referencias) * np.sqrt(max(fator_paa, 1))
+    fim = time.time()
+
+    # Reorganiza o tensor (classes x derivações) em {classe: {derivação: distância}}
+    distancias = {
+        c: {d: matriz[ic, id_] for id_, d in enumerate(derivacoes)}
+        for ic, c in enumerate(classes)
+    }
+
+    # Retorna as distâncias e o tempo médio por comparação (beat x protótipo)
+    return distancias, (fim - inicio) / matriz.size
+
+def empilha_derivacoes(batimentos, derivacoes):
+    # Junta os batimentos {derivação: batimento} em um array (amostras x derivações)
+    return np.stack([np.asarray(batimentos[d], dtype=np.float64) for d in derivacoes], axis=1)
+
+def calcular_distancias_dtw_dependente(batimentos, prototipos_por_classe, fastDTW=False, fator_paa=1,
+                                       usa_derivada=False):
+    # Versão multivariada dependente: uma única distância por classe, com todas as derivações
+    # alinhadas pelo mesmo caminho (DTW_dependente ou, com fastDTW, fastdtw_custom
+    # multivariado); retorna {classe: distância} e o tempo médio por protótipo
+    # fator_paa / usa_derivada: como em calcular_distancias_dtw_lote
+    classes = list(prototipos_por_classe)
+    derivacoes = [d for d in batimentos
+                  if all(d in prototipos_por_classe[c] for c in classes)]
+
+    consulta = empilha_derivacoes(batimentos, derivacoes)
+    referencias = np.stack([empilha_derivacoes(prototipos_por_classe[c], derivacoes) for c in classes])
+
+    inicio = time.time()
+    consulta = representacao(consulta, fator_paa, usa_derivada, axis=0)
+    referencias = representacao(referencias, fator_paa, usa_derivada, axis=1)
+    if fastDTW:
+        distancias = [fastdtw_custom(consulta, r, radius=2) for r in referencias]
+    else:
+        distancias = DTW_dependente(consulta, referencias)
+    distancias = np.asarray(distancias) * np.sqrt(max(fator_paa, 1))
+    fim = time.time()
+
+    return dict(zip(classes, distancias)), (fim - inicio) / len(classes)
+
+def lb_kim(s, t):
+    # Limite inferior LB_Kim (primeiro e último pontos): todo alinhamento casa s[0] com t[0]
+    # e s[-1] com t[-1], então esses custos sempre entram na soma
+    s = np.asarray(s, dtype=np.float64).ravel()
+    t = np.asarray(t, dtype=np.float64).ravel()
+    if len(s) == 1 or len(t) == 1:
+        return 0.0
+    return np.sqrt((s[0] - t[0]) ** 2 + (s[-1] - t[-1]) ** 2)
+
+def envelope(prototipo, janela=None, fracao=None):
+    # Envelope superior/inferior do protótipo para o LB_Keogh: máximo e mínimo em
+    # uma janela de ±janela amostras (a mesma banda usada no DTW)
+    prototipo = np.asarray(prototipo, dtype=np.float64).ravel()
+    m = len(prototipo)
+    r = min(_largura_banda(m, m, janela, fracao), m - 1)
+
+    vizinhanca = sliding_window_view(np.pad(prototipo, r, mode='edge'), 2 * r + 1)
+    return vizinhanca.min(axis=1), vizinhanca.max(axis=1)
+
+def lb_keogh(s, env):
+    # Limite inferior LB_Keogh: soma quadrática do quanto o batimento sai do envelope
+    # Só é válido para séries do mesmo comprimento; caso contrário retorna 0 (sem poda)
+    s = np.asarray(s, dtype=np.float64).ravel()
+    inferior, superior = env
+    if len(s) != len(inferior):
+        return 0.0
+    excesso = np.maximum(s - superior, 0) + np.maximum(inferior - s, 0)
+    return np.sqrt(np.sum(excesso ** 2))
+
+def prepara_envelopes(prototipos_por_classe, janela=None, fracao=None):
+    # Pré-calcula os envelopes de todos os protótipos: {classe: {derivação: (inferior, superior)}}
+    return {
+        classe: {d: envelope(p, janela, fracao) for d, p in prototipos.items()}
+        for classe, prototipos in prototipos_por_classe.items()
+    }
+
+def classificar_com_poda(batimentos, prototipos_por_classe, envelopes=None, janela=None, fracao=None):
+    # Classificação pelo protótipo mais próximo em cada derivação com cascata de limites
+    # inferiores (LB_Kim -> LB_Keogh) e DTW com abandono antecipado
+    # Retorna as classificações no formato de classificar_com_base_nas_distancias e as
+    # estatísticas de poda
+    if envelopes is None:
+        envelopes = prepara_envelopes(prototipos_por_classe, janela, fracao)
+
+    classes = list(prototipos_por_classe)
+    classificacoes = {}
+    estatisticas = {'comparacoes': 0, 'podadas_kim': 0, 'podadas_keogh': 0,
+                    'abandonadas': 0, 'completas': 0}
+
+    for derivacao, batimento in batimentos.items():
+        candidatos = [c for c in classes if derivacao in prototipos_por_classe[c]]
+
+        # Visita os candidatos em ordem crescente de LB_Keogh (o mais promissor primeiro)
+        limites = {c: lb_keogh(batimento, envelopes[c][derivacao]) for c in candidatos}
+        ordem = sorted(candidatos, key=lambda c: limites[c])
+
+        melhor_classe, melhor_dist = None, np.inf
+        for classe in ordem:
+            estatisticas['comparacoes'] += 1
+            prototipo = prototipos_por_classe[classe][derivacao]
+
+            if lb_kim(batimento, prototipo) > melhor_dist:
+                estatisticas['podadas_kim'] += 1
+                continue
+            if limites[classe] > melhor_dist:
+                estatisticas['podadas_keogh'] += 1
+                continue
+
+            dist = DTW_banda(batimento, prototipo, janela, fracao,
+                             limite=None if np.isinf(melhor_dist) else melhor_dist)
+            if np.isinf(dist):
+                estatisticas['abandonadas'] += 1
+                continue
+            estatisticas['completas'] += 1
+
+            # Em caso de empate vence a classe listada por último, como em
+            # classificar_com_base_nas_distancias (NORMAL só vence com distância estritamente menor)
+            if dist < melhor_dist or (dist == melhor_dist and classes.index(classe) > classes.index(melhor_classe)):
+                melhor_classe, melhor_dist = classe, dist
+
+        classificacoes[derivacao] = melhor_classe
+
+    return classificacoes, estatisticas
\ No newline at end of file
@@ -1,9 +1,15 @@
 import numpy as np
-from scipy.signal import iirnotch, butter, filtfilt, find_peaks
-import wfdb
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import iirnotch, butter, filtfilt, find_peaks, convolve, sosfiltfilt, tf2sos
+from functools import partial
+from paralelo import mapeia_em_paralelo
+from instrumentacao import cronometrado, conta
 
+@cronometrado('carga')
 def load_ECG(path, fs, return_record=False):
   # Lê um registro de ECG no formato WFDB a partir do caminho especificado
+  # (wfdb é importado aqui: carrega pandas e só é necessário para ler registros do disco)
+  import wfdb
   record = wfdb.rdrecord(path)  # Carrega o registro usando a biblioteca WFDB
 
   # Extrai o sinal analógico do registro (shape: [n_amostras, n_derivações])
@@ -16,30 +22,92 @@ def load_ECG(path, fs, return_record=False):
     # Caso contrário, retorna apenas o sinal
     return signal
     
-def highpass_filter(signal, fs=500, cutoff=0.5, order=4):
+def highpass_filter(signal, fs=500, cutoff=0.5, order=4, axis=-1):
     # Filtro passa-altas para remover deriva de linha de base
     nyq = 0.5 * fs  # Frequência de Nyquist
     b, a = butter(order, cutoff / nyq, btype='high', analog=False)  # Coeficientes do filtro Butterworth
-    return filtfilt(b, a, signal)  # Filtragem com correção de fase
+    return filtfilt(b, a, signal, axis=axis)  # Filtragem com correção de fase
 
-def notch_filter(signal, fs=500, freq=60.0, Q=30):
+def notch_filter(signal, fs=500, freq=60.0, Q=30, axis=-1):
     # Filtro notch (rejeição de banda) para remover interferência da rede elétrica (60 Hz)
     b, a = iirnotch(freq, Q, fs)
-    return filtfilt(b, a, signal)
+    return filtfilt(b, a, signal, axis=axis)
 
-def min_max_scale(signal):
-    # Normaliza o sinal para o intervalo [-1, 1]
-    return 2 * (signal - np.min(signal)) / (np.max(signal) - np.min(signal)) - 1
+def min_max_scale(signal, axis=None):
+    # Normaliza o sinal para o intervalo [-1, 1] (por coluna se axis=0)
+    minimo = np.min(signal, axis=axis, keepdims=axis is not None)
+    maximo = np.max(signal, axis=axis, keepdims=axis is not None)
+    return 2 * (signal - minimo) / (maximo - minimo) - 1
 
-def bandpass_filter(signal_data, lowcut=5, highcut=15, fs=500, order=1):
+def bandpass_filter(signal_data, lowcut=5, highcut=15, fs=500, order=1, axis=-1):
     # Filtro passa-banda para destacar componentes relevantes do ECG (ex.: QRS)
     nyquist = 0.5 * fs
     low = lowcut / nyquist
     high = highcut / nyquist
     b, a = butter(order, [low, high], btype='band')
-    y = filtfilt(b, a, signal_data)
+    y = filtfilt(b, a, signal_data, axis=axis)
     return y
 
+class BancoFiltros:
+    # Banco de filtros reutilizável: cada filtro é projetado uma única vez por
+    # (fs, parâmetros), guardado em seções de segunda ordem (SOS) e aplicado com
+    # sosfiltfilt a lotes de sinais (ao longo de axis)
+    # O padlen reproduz o padding padrão do filtfilt das funções acima, mas a saída não é
+    # idêntica à delas: no passa-altas de ordem 4 os coeficientes (b, a) são mal
+    # condicionados e a diferença chega a ~1e-5 (em sinais normalizados); no notch e no
+    # passa-banda ela é de arredondamento
+
+    def __init__(self, fs=500):
+        self.fs = fs
+        self._filtros = {}  # (tipo, parâmetros) -> (sos, padlen)
+
+    def _projeta(self, chave):
+        # Projeta (ou recupera) o filtro correspondente à chave
+        if chave not in self._filtros:
+            tipo, *parametros = chave
+            nyq = 0.5 * self.fs
+            if tipo == 'highpass':
+                cutoff, order = parametros
+                b, a = butter(order, cutoff / nyq, btype='high', analog=False)
+                sos = butter(order, cutoff / nyq, btype='high', analog=False, output='sos')
+            elif tipo == 'notch':
+                freq, Q = parametros
+                b, a = iirnotch(freq, Q, self.fs)
+                sos = tf2sos(b, a)
+            elif tipo == 'bandpass':
+                lowcut, highcut, order = parametros
+                b, a = butter(order, [lowcut / nyq, highcut / nyq], btype='band')
+                sos = butter(order, [lowcut / nyq, highcut / nyq], btype='band', output='sos')
+            else:
+                raise ValueError(f"tipo de filtro desconhecido: {tipo!r}")
+            self._filtros[chave] = (sos, 3 * max(len(a), len(b)))
+        return self._filtros[chave]
+
+    def _aplica(self, chave, signal, axis):
+        sos, padlen = self._projeta(chave)
+        return sosfiltfilt(sos, signal, axis=axis, padlen=padlen)
+
+    def highpass(self, signal, cutoff=0.5, order=4, axis=-1):
+        # Mesmo filtro de highpass_filter (diferença até ~1e-5)
+        return self._aplica(('highpass', cutoff, order), signal, axis)
+
+    def notch(self, signal, freq=60.0, Q=30, axis=-1):
+        # Mesmo filtro de notch_filter (diferença de arredondamento)
+        return self._aplica(('notch', freq, Q), signal, axis)
+
+    def bandpass(self, signal, lowcut=5, highcut=15, order=1, axis=-1):
+        # Mesmo filtro de bandpass_filter (diferença de arredondamento)
+        return self._aplica(('bandpass', lowcut, highcut, order), signal, axis)
+
+# Bancos de filtros compartilhados, um por frequência de amostragem
+_BANCOS = {}
+
+def banco_filtros(fs=500):
+    # Retorna o banco de filtros da frequência de amostragem fs (criado na primeira chamada)
+    if fs not in _BANCOS:
+        _BANCOS[fs] = BancoFiltros(fs)
+    return _BANCOS[fs]
+
 def derivative(signal_data):
     # Derivada discreta para detectar mudanças rápidas no sinal (bordas do QRS)
     derivative = np.diff(signal_data)
@@ -56,9 +124,10 @@ def moving_window_integration(signal_data, window_size=30):
     integrated = np.convolve(signal_data, window, mode='same')
     return integrated
 
-def detect_qrs(signal_data, fs=500):
+@cronometrado('deteccao_qrs')
+def detect_qrs(signal_data, fs=500, banda=(5, 15)):
     # Pipeline completo para detectar picos QRS:
-    filtered = bandpass_filter(signal_data)              # Filtro passa-banda
+    filtered = bandpass_filter(signal_data, *banda, fs=fs)  # Filtro passa-banda
     deriv = derivative(filtered)                         # Derivada
     squared = square(deriv)                              # Elevação ao quadrado
     integrated = moving_window_integration(squared)      # Integração
@@ -69,96 +138,161 @@ def detect_qrs(signal_data, fs=500):
     
     return peaks, integrated
 
-def clean_ECG(ECG, canal, fs=500):
+@cronometrado('filtragem')
+def clean_ECG(ECG, canal, fs=500, cutoff=0.5, notch_freq=60.0, notch_Q=30):
     # Pré-processamento completo para um canal do ECG:
-    ECG_clean = highpass_filter(ECG[:, canal])  # Remove baixa frequência
-    ECG_clean = notch_filter(ECG_clean)         # Remove interferência 60Hz
+    ECG_clean = highpass_filter(ECG[:, canal], fs, cutoff)     # Remove baixa frequência
+    ECG_clean = notch_filter(ECG_clean, fs, notch_freq, notch_Q)  # Remove interferência 60Hz
     ECG_clean = min_max_scale(ECG_clean)        # Normaliza entre [-1, 1]
     return ECG_clean
 
-def extract_beats(ecg_signal, y_signal, qrs_peaks, fs=500, window_size=200):
+@cronometrado('extracao')
+def extract_beats(ecg_signal, y_signal, qrs_peaks, fs=500, window_size=200, n_beats=5):
     # Extrai segmentos de batimentos centrados nos picos QRS
-    beats = []
+    # Apenas os primeiros n_beats picos detectados (None: todos); janelas que ultrapassam
+    # os limites do sinal são ignoradas
+    return list(extrai_janelas(ecg_signal, qrs_peaks, window_size, n_beats))
+
+def alinha_picos_r(sinal, picos, raio):
+    # Desloca cada pico para o máximo de |sinal| a até `raio` amostras dele (o pico da
+    # integração fica deslocado em relação à onda R); todos os picos de uma vez, por janelas
+    picos = np.asarray(picos, dtype=np.int64)
+    if raio <= 0 or len(picos) == 0:
+        return picos
+    vizinhanca = sliding_window_view(np.pad(np.abs(sinal), raio, constant_values=-np.inf), 2 * raio + 1)
+    return picos + np.argmax(vizinhanca[picos], axis=1) - raio
+
+def extrai_janelas(sinal, picos, window_size=200, n_beats=5, alinhamento=0):
+    # Batimentos (batimentos x amostras) centrados nos picos, recortados de uma vista
+    # deslizante do sinal (sem cópia) e copiados de uma só vez na indexação final
+    # n_beats: quantos dos primeiros picos detectados usar (None: todos os do registro)
+    # alinhamento: raio (em amostras) para realinhar os picos à onda R (0 desativa)
     half_window = window_size // 2
+    picos = np.asarray(picos, dtype=np.int64)[:n_beats]
+    picos = alinha_picos_r(sinal, picos, alinhamento)
+
+    # Janela que começa em i: sinal[i:i + window_size]; mantém só as que cabem no sinal
+    inicios = picos - half_window
+    inicios = inicios[(inicios >= 0) & (inicios + window_size <= len(sinal))]
+    if len(sinal) < window_size:
+        return np.empty((0, window_size), dtype=np.asarray(sinal).dtype)
+    return sliding_window_view(sinal, window_size)[inicios]
+
+@cronometrado('filtragem')
+def clean_ECG_multicanal(ECG, canais, fs=500, cutoff=0.5, notch_freq=60.0, notch_Q=30):
+    # Mesmo pré-processamento de clean_ECG, aplicado a todos os canais de uma vez
+    # (os filtros do banco operam ao longo do eixo das amostras de um array [n_amostras, n_canais])
+    banco = banco_filtros(fs)  # Filtros projetados uma única vez por fs/parâmetros
+    ECG_clean = banco.highpass(ECG[:, canais], cutoff, axis=0)
+    ECG_clean = banco.notch(ECG_clean, notch_freq, notch_Q, axis=0)
+    ECG_clean = min_max_scale(ECG_clean, axis=0)
+    return ECG_clean
 
-    for peak in qrs_peaks[:5]:  # Extrai apenas os primeiros 5 batimentos detectados
-        start = peak - half_window
-        end = peak + half_window
+@cronometrado('deteccao_qrs')
+def detect_qrs_multicanal(ECG_clean, fs=500, banda=(5, 15), window_size=30):
+    # Versão de detect_qrs para um array [n_amostras, n_canais]: filtragem, derivada,
+    # quadrado e integração são feitos em todos os canais juntos; apenas o find_peaks
+    # (que só aceita sinais 1-D) é chamado por canal
+    filtered = banco_filtros(fs).bandpass(ECG_clean, *banda, axis=0)
+    deriv = np.diff(filtered, axis=0, append=filtered[-1:])  # Última diferença 0, como em derivative()
+    squared = square(deriv)
+    integrated = convolve(squared, np.ones((window_size, 1)) / window_size, mode='same', method='direct')
+    integrated = integrated / np.max(integrated, axis=0)  # Normalização por canal
 
-        if start < 0 or end > len(ecg_signal):
-            continue  # Ignora se a janela ultrapassar os limites do sinal
+    distance = int(0.4 * fs)  # Intervalo mínimo de 400ms entre picos
+    peaks = [find_peaks(integrated[:, c], distance=distance, height=0.5)[0]
+             for c in range(integrated.shape[1])]
 
-        beat = ecg_signal[start:end]
-        beats.append(beat)
+    return peaks, integrated
 
-    return beats
+@cronometrado('extracao')
+def extract_beats_multicanal(ECG_clean, peaks, window_size=200, n_beats=5, alinhamento=0):
+    # Versão de extract_beats para um array [n_amostras, n_canais]: as janelas de todos os
+    # picos válidos de cada canal são recortadas de uma só vez por extrai_janelas
+    return [extrai_janelas(ECG_clean[:, c], picos, window_size, n_beats, alinhamento)
+            for c, picos in enumerate(peaks)]
 
 def mean_template(segments):
     # Calcula o template médio de batimentos (protótipo)
     # Empilha os segmentos em uma matriz e calcula a média por coluna (tempo)
     return np.mean(np.vstack(segments), axis=0)
 
-def cria_template(df=None, ECG_path=None, canais=[6, 7, 8, 9], ref_template=False):
-    # Inicializa listas para armazenar batimentos por canal (pré-definidos como V1–V4)
-    batimentos_V1 = []  # Canal 6
-    batimentos_V2 = []  # Canal 7
-    batimentos_V3 = []  # Canal 8
-    batimentos_V4 = []  # Canal 9
-
-    # Itera pelos canais especificados
-    for canal in canais:
-        if ref_template:
-            # Modo: extrair batimentos de múltiplos arquivos referenciados no DataFrame
-            for idx, row in df.iterrows():
-                ECG = load_ECG(path + row['filename_hr'], 500)  # Carrega o sinal (shape: [n_amostras, n_canais])
-                ECG_clean = clean_ECG(ECG, canal)               # Aplica filtragem no canal selecionado
-                peaks, _ = detect_qrs(ECG_clean)                 # Detecta picos QRS
-
-                beats = extract_beats(ECG_clean, 0, peaks)       # Extrai batimentos com janela centrada nos picos
-                beats = np.array(beats)
-
-                # Verifica se há batimentos extraídos
-                if beats.ndim == 2:
-                    # Armazena os batimentos no canal correspondente
-                    if canal == 6:
-                        batimentos_V1.append(beats)
-                    elif canal == 7:
-                        batimentos_V2.append(beats)
-                    elif canal == 8:
-                        batimentos_V3.append(beats)
-                    elif canal == 9:
-                        batimentos_V4.append(beats)
-
-        else:
-            # Modo: usar um único arquivo para gerar os batimentos
-            ECG = load_ECG(path + ECG_path, 500)         # Carrega o sinal
-            ECG_clean = clean_ECG(ECG, canal)            # Filtra o canal
-            peaks, _ = detect_qrs(ECG_clean)             # Detecta QRS
-            beats = extract_beats(ECG_clean, 0, peaks)   # Extrai batimentos
-            beats = np.array(beats)
-
-            if beats.ndim == 2:
-                if canal == 6:
-                    batimentos_V1.append(beats)
-                elif canal == 7:
-                    batimentos_V2.append(beats)
-                elif canal == 8:
-                    batimentos_V3.append(beats)
-                elif canal == 9:
-                    batimentos_V4.append(beats)
-
-    # Concatena todos os batimentos de cada canal
-    batimentos_V1 = np.concatenate(batimentos_V1, axis=0)
-    batimentos_V2 = np.concatenate(batimentos_V2, axis=0)
-    batimentos_V3 = np.concatenate(batimentos_V3, axis=0)
-    batimentos_V4 = np.concatenate(batimentos_V4, axis=0)
-
-    # Calcula o template médio (protótipo) para cada canal
+# Parâmetros padrão do pipeline de pré-processamento (também compõem a chave do cache)
+PARAMETROS_PIPELINE = {
+    'fs': 500,
+    'cutoff': 0.5,        # Passa-altas (Hz)
+    'notch_freq': 60.0,   # Notch (Hz)
+    'notch_Q': 30,
+    'banda': (5, 15),     # Passa-banda da detecção de QRS (Hz)
+    'window_size': 200,   # Amostras por batimento
+    'n_beats': 5,         # Batimentos extraídos por registro (None: todos)
+    'alinhamento': 0,     # Raio (amostras) para alinhar os batimentos à onda R (0: sem alinhamento)
+}
+
+# Nomes das 12 derivações na ordem dos canais dos registros PTB-XL
+DERIVACOES = ['I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6']
+
+def processa_registro(caminho, canais, cache=None, **parametros):
+    # Carrega o registro uma única vez e filtra, detecta QRS e extrai os batimentos de
+    # todos os canais selecionados em uma passada multicanal
+    # Se um CacheECG for informado, o resultado é lido do cache quando já existir
+    # Retorna {canal: (sinal filtrado, batimentos)}
+    p = {**PARAMETROS_PIPELINE, **parametros}
+    canais = list(canais)
+
+    if cache is not None:
+        chave = cache.chave(caminho, canais=canais, **p)
+        salvo = cache.obter(chave)
+        if salvo is not None:
+            conta('registros_cache')
+            return {c: (salvo[f'sinal_{c}'], salvo[f'beats_{c}']) for c in canais}
+
+    ECG = load_ECG(caminho, p['fs'])                                   # Carrega o sinal (shape: [n_amostras, n_canais])
+    ECG_clean = clean_ECG_multicanal(ECG, canais, p['fs'], p['cutoff'], p['notch_freq'], p['notch_Q'])
+    peaks, _ = detect_qrs_multicanal(ECG_clean, p['fs'], p['banda'])   # Detecta picos QRS por canal
+    beats = extract_beats_multicanal(ECG_clean, peaks, p['window_size'], p['n_beats'], p['alinhamento'])
+    conta('registros')
+    conta('batimentos', sum(len(b) for b in beats))
+
+    resultado = {c: (ECG_clean[:, i], beats[i]) for i, c in enumerate(canais)}
+
+    if cache is not None:
+        arrays = {}
+        for c, (sinal, b) in resultado.items():
+            arrays[f'sinal_{c}'] = sinal
+            arrays[f'beats_{c}'] = b
+        cache.salvar(chave, arrays)
+
+    return resultado
+
+def cria_template(df=None, ECG_path=None, canais=[6, 7, 8, 9], ref_template=False, path='', cache=None,
+                  n_workers=1, chunksize=None, template=None, **parametros):
+    # template: função que resume os batimentos de uma derivação (padrão: mean_template;
+    # ex.: matriz_distancias.medoid_template para o medoide por DTW)
+    # Batimentos acumulados por canal
+    batimentos = {canal: [] for canal in canais}
+
+    # Modo ref_template: batimentos de múltiplos arquivos referenciados no DataFrame
+    # Caso contrário: um único arquivo gera os batimentos
+    arquivos = df['filename_hr'] if ref_template else [ECG_path]
+
+    # Cada registro é lido uma única vez e todos os canais são processados juntos
+    # Com n_workers > 1 os registros são distribuídos em um pool de processos; os
+    # resultados voltam na ordem dos arquivos, então o protótipo é o mesmo da execução serial
+    processa = partial(processa_registro, canais=canais, cache=cache, **parametros)
+    registros = mapeia_em_paralelo(processa, [path + arquivo for arquivo in arquivos], n_workers, chunksize)
+
+    for registro in registros:
+        for canal, (_, beats) in registro.items():
+            # Verifica se há batimentos extraídos
+            if len(beats) > 0:
+                batimentos[canal].append(beats)
+
+    # Concatena os batimentos de cada canal e calcula o template médio (protótipo)
+    template = template or mean_template
     prototipo = {
-        'V1': mean_template(batimentos_V1),
-        'V2': mean_template(batimentos_V2),
-        'V3': mean_template(batimentos_V3),
-        'V4': mean_template(batimentos_V4)
+        DERIVACOES[canal]: template(np.concatenate(batimentos[canal], axis=0))
+        for canal in canais
     }
 
     return prototipo
\ No newline at end of file
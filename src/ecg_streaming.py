@@ -0,0 +1,223 @@
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, tf2sos
+
+class DetectorQRSStreaming:
+    # Detector de QRS e extrator de batimentos em fluxo contínuo
+    # Recebe blocos de amostras ([n_amostras] ou [n_amostras, n_canais]) e mantém entre
+    # eles o estado dos filtros (sosfilt com zi), da derivada e da integração, de modo que
+    # o resultado não dependa do tamanho dos blocos
+    # Diferenças em relação ao pipeline em lote (detect_qrs / extract_beats):
+    #   - os filtros são causais (sosfilt em vez de filtfilt), então há atraso de fase;
+    #   - no lugar da normalização pelo máximo global da integração, usa limiar adaptativo
+    #     no estilo Pan-Tompkins (estimativas de pico de sinal e de ruído);
+    #   - cada batimento é normalizado para [-1, 1] pelo mínimo/máximo dos últimos
+    #     `historico` segundos do canal, e não do registro inteiro
+    # A memória é limitada pelo histórico, independentemente da duração do registro
+
+    def __init__(self, fs=500, cutoff=0.5, notch_freq=60.0, notch_Q=30, banda=(5, 15),
+                 window_size=200, janela_integracao=30, historico=10.0, aprendizado=2.0):
+        self.fs = fs
+        self.window_size = window_size
+        self.half_window = window_size // 2
+        self.janela_integracao = janela_integracao
+        self.refratario = int(0.4 * fs)          # Intervalo mínimo de 400ms entre picos (como em detect_qrs)
+        self.aprendizado = int(aprendizado * fs)  # Amostras usadas para iniciar os limiares
+        self.tamanho_historico = max(int(historico * fs), window_size + self.refratario + janela_integracao)
+        # Amostras mantidas: além da janela de normalização, o atraso máximo entre o fim de um
+        # batimento e a sua emissão (período refratário + integração), para que a janela nunca
+        # seja cortada pelo aparo e o resultado não dependa do tamanho dos blocos
+        self._retencao = self.tamanho_historico + self.refratario + janela_integracao
+
+        # Filtros em SOS: passa-altas + notch para o sinal limpo, passa-banda para a detecção
+        nyq = 0.5 * fs
+        self._sos_limpeza = np.vstack([
+            butter(4, cutoff / nyq, btype='high', output='sos'),
+            tf2sos(*iirnotch(notch_freq, notch_Q, fs)),
+        ])
+        self._sos_deteccao = butter(1, [banda[0] / nyq, banda[1] / nyq], btype='band', output='sos')
+
+        self._iniciado = False
+        self.amostras = 0   # Total de amostras recebidas
+        self.batimentos = 0  # Total de batimentos emitidos
+
+    def _inicia(self, primeira_amostra):
+        # Estado dos filtros e da detecção, criado no primeiro bloco (quando o número de canais é conhecido)
+        # O passa-altas parte do regime permanente da primeira amostra, evitando o transiente do nível DC
+        n_canais = len(primeira_amostra)
+        self.n_canais = n_canais
+        self._zi_limpeza = sosfilt_zi(self._sos_limpeza)[:, :, None] * primeira_amostra
+        self._zi_deteccao = np.zeros((self._sos_deteccao.shape[0], 2, n_canais))
+        self._ultimo_filtrado = np.zeros(n_canais)                        # Para a derivada
+        self._cauda_quadrado = np.zeros((self.janela_integracao - 1, n_canais))  # Para a integração
+        self._cauda_integrado = np.zeros((2, n_canais))                   # Para achar máximos locais
+        self._historico = np.zeros((0, n_canais))                        # Sinal limpo recente
+        self._aprendendo = []                                             # Integração durante o aprendizado
+
+        # Limiar adaptativo por canal: estimativas de pico de sinal (spki) e de ruído (npki)
+        self._spki = np.zeros(n_canais)
+        self._npki = np.zeros(n_canais)
+        self._pendente = [None] * n_canais    # Pico candidato (indice, valor) aguardando o período refratário
+        self._aguardando = []                 # (canal, centro) de batimentos à espera da metade direita
+        self._iniciado = True
+
+    def _limiar(self, c):
+        return self._npki[c] + 0.25 * (self._spki[c] - self._npki[c])
+
+    def _confirma(self, c):
+        # Confirma o pico pendente do canal como QRS e agenda o recorte do batimento
+        indice, valor = self._pendente[c]
+        self._spki[c] = 0.125 * valor + 0.875 * self._spki[c]
+        self._pendente[c] = None
+
+        # A integração causal atrasa o pico em ~metade da janela em relação à versão centrada
+        centro = indice - self.janela_integracao // 2
+        if centro - self.half_window >= 0:
+            self._aguardando.append((c, centro))
+
+    def _avalia_picos(self, integrado, inicio):
+        # Percorre os máximos locais da integração (índice global da primeira amostra = inicio)
+        # Inclui as duas últimas amostras do bloco anterior para não perder picos na fronteira
+        estendido = np.vstack([self._cauda_integrado, integrado])
+        base = inicio - 2
+
+        for c in range(self.n_canais):
+            x = estendido[:, c]
+            maximos = np.flatnonzero((x[1:-1] > x[:-2]) & (x[1:-1] >= x[2:])) + 1
+
+            for j in maximos:
+                indice, valor = base + j, x[j]
+                pendente = self._pendente[c]
+
+                # Confirma o pendente se o novo candidato já está fora do período refratário
+                if pendente is not None and indice - pendente[0] >= self.refratario:
+                    self._confirma(c)
+                    pendente = None
+
+                if valor > self._limiar(c):
+                    # Dentro do período refratário só o maior pico sobrevive (como o distance do find_peaks)
+                    if pendente is None or valor > pendente[1]:
+                        self._pendente[c] = (indice, valor)
+                else:
+                    self._npki[c] = 0.125 * valor + 0.875 * self._npki[c]
+
+        self._cauda_integrado = estendido[-2:]
+
+    def processa(self, bloco):
+        # Consome um bloco de amostras e retorna a lista de batimentos prontos:
+        # (canal, índice global do centro, batimento normalizado)
+        bloco = np.asarray(bloco, dtype=np.float64)
+        if bloco.ndim == 1:
+            bloco = bloco[:, None]
+        if not self._iniciado:
+            self._inicia(bloco[0])
+
+        inicio = self.amostras
+        n = len(bloco)
+
+        # Filtragem causal com estado entre blocos
+        limpo, self._zi_limpeza = sosfilt(self._sos_limpeza, bloco, axis=0, zi=self._zi_limpeza)
+        filtrado, self._zi_deteccao = sosfilt(self._sos_deteccao, limpo, axis=0, zi=self._zi_deteccao)
+
+        # Derivada, quadrado e integração por janela móvel (causal)
+        deriv = np.diff(np.vstack([self._ultimo_filtrado, filtrado]), axis=0)
+        self._ultimo_filtrado = filtrado[-1]
+        quadrado = np.vstack([self._cauda_quadrado, deriv ** 2])
+        acumulado = np.cumsum(np.vstack([np.zeros((1, self.n_canais)), quadrado]), axis=0)
+        w = self.janela_integracao
+        integrado = (acumulado[w:] - acumulado[:-w]) / w
+        self._cauda_quadrado = quadrado[-(w - 1):]
+
+        # Histórico do sinal limpo (para recortar e normalizar os batimentos); é aparado
+        # para _retencao amostras depois da emissão, então a memória fica limitada
+        self._historico = np.vstack([self._historico, limpo])
+        self.amostras += n
+
+        # Aprendizado: acumula os primeiros segundos para iniciar os limiares
+        if self._aprendendo is not None:
+            self._aprendendo.append(integrado)
+            acumulado_aprendizado = np.vstack(self._aprendendo)
+            if len(acumulado_aprendizado) < self.aprendizado:
+                self._historico = self._historico[-self._retencao:]
+                return []
+            # Limiares iniciados exatamente com as primeiras `aprendizado` amostras
+            self._spki = acumulado_aprendizado[:self.aprendizado].max(axis=0) / 3
+            self._npki = acumulado_aprendizado[:self.aprendizado].mean(axis=0) / 2
+            self._aprendendo = None
+            integrado, inicio = acumulado_aprendizado, self.amostras - len(acumulado_aprendizado)
+
+        self._avalia_picos(integrado, inicio)
+
+        # Confirma pendentes cujo período refratário já terminou
+        for c in range(self.n_canais):
+            if self._pendente[c] is not None and self.amostras - 1 - self._pendente[c][0] >= self.refratario:
+                self._confirma(c)
+
+        prontos = self._emite_prontos()
+        self._historico = self._historico[-self._retencao:]
+        return prontos
+
+    def finaliza(self):
+        # Fim do fluxo: confirma os picos ainda no período refratário e retorna os batimentos
+        # cuja janela completa já chegou; os que terminariam depois da última amostra são
+        # descartados (como em extract_beats)
+        if not self._iniciado:
+            return []
+        if self._aprendendo is not None:
+            # Fluxo mais curto que o aprendizado: avalia o que houver
+            acumulado_aprendizado = np.vstack(self._aprendendo)
+            self._spki = acumulado_aprendizado.max(axis=0) / 3
+            self._npki = acumulado_aprendizado.mean(axis=0) / 2
+            self._aprendendo = None
+            self._avalia_picos(acumulado_aprendizado, self.amostras - len(acumulado_aprendizado))
+
+        for c in range(self.n_canais):
+            if self._pendente[c] is not None:
+                self._confirma(c)
+        prontos = self._emite_prontos()
+        self._aguardando = []
+        return prontos
+
+    def _emite_prontos(self):
+        # Recorta os batimentos cuja metade direita já chegou
+        # A normalização usa os `historico` segundos que terminam no fim do batimento, de modo
+        # que o resultado não dependa de quando (em qual bloco) o batimento é emitido
+        prontos, restantes = [], []
+        primeiro = self.amostras - len(self._historico)  # Índice global da primeira amostra do histórico
+
+        for c, centro in self._aguardando:
+            fim = centro + self.window_size - self.half_window
+            if fim > self.amostras:
+                restantes.append((c, centro))
+                continue
+            ini = centro - self.half_window - primeiro
+            if ini < 0:
+                continue  # Saiu do histórico (não deve ocorrer com o histórico mínimo)
+
+            fim -= primeiro
+            recente = self._historico[max(0, fim - self.tamanho_historico):fim, c]
+            minimo, maximo = recente.min(), recente.max()
+            beat = self._historico[ini:fim, c]
+            prontos.append((c, centro, 2 * (beat - minimo) / (maximo - minimo) - 1))
+
+        # Ordem determinística: por posição no sinal e depois por canal
+        prontos.sort(key=lambda b: (b[1], b[0]))
+        self._aguardando = restantes
+        self.batimentos += len(prontos)
+        return prontos
+
+def blocos(sinal, tamanho=250):
+    # Divide um sinal em memória em blocos de `tamanho` amostras (simula uma fonte contínua)
+    for inicio in range(0, len(sinal), tamanho):
+        yield sinal[inicio:inicio + tamanho]
+
+def batimentos_streaming(fonte, canais=None, **parametros):
+    # Gerador de batimentos a partir de um iterável de blocos de amostras
+    # Os batimentos são produzidos assim que sua metade direita chega, com memória limitada
+    # canais seleciona colunas de blocos 2-D (ex.: [6, 7, 8, 9] para V1–V4)
+    detector = DetectorQRSStreaming(**parametros)
+    for bloco in fonte:
+        bloco = np.asarray(bloco)
+        if canais is not None:
+            bloco = bloco[:, canais]
+        yield from detector.processa(bloco)
+    yield from detector.finaliza()
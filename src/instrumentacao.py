@@ -0,0 +1,126 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import numpy as np
+
+# Instrumentação leve do pipeline (carga -> filtragem -> detecção -> extração -> DTW)
+# Desativada por padrão: cronômetros e contadores custam apenas uma verificação de flag
+# Os dados são mantidos por processo; com pool de processos, cada worker tem os seus
+
+ATIVO = False
+_tempos = defaultdict(list)     # etapa -> lista de durações (s)
+_contadores = defaultdict(int)  # nome -> total
+_NULO = nullcontext()
+
+def ativa(valor=True):
+    # Liga (ou desliga) a coleta de tempos e contadores
+    global ATIVO
+    ATIVO = valor
+
+def reinicia():
+    # Descarta os tempos e contadores coletados
+    _tempos.clear()
+    _contadores.clear()
+
+class _Cronometro:
+    __slots__ = ('etapa', 'inicio')
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _tempos[self.etapa].append(time.perf_counter() - self.inicio)
+        return False
+
+def cronometro(etapa):
+    # Gerenciador de contexto que mede a duração do bloco na etapa indicada
+    #   with cronometro('filtragem'): ...
+    return _Cronometro(etapa) if ATIVO else _NULO
+
+def cronometrado(etapa):
+    # Decorador que mede cada chamada da função na etapa indicada
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not ATIVO:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                _tempos[etapa].append(time.perf_counter() - inicio)
+        return envolvida
+    return decorador
+
+def conta(nome, quantidade=1):
+    # Incrementa um contador (ex.: 'registros', 'batimentos', 'celulas_dtw')
+    if ATIVO:
+        _contadores[nome] += int(quantidade)
+
+def resumo():
+    # Resumo por etapa (chamadas, total, média e percentis em ms) e contadores
+    etapas = {}
+    for etapa, tempos in _tempos.items():
+        t = 1e3 * np.array(tempos)
+        etapas[etapa] = {
+            'chamadas': len(t),
+            'total_ms': t.sum(),
+            'media_ms': t.mean(),
+            'p50_ms': np.percentile(t, 50),
+            'p90_ms': np.percentile(t, 90),
+            'p99_ms': np.percentile(t, 99),
+        }
+    return {'etapas': etapas, 'contadores': dict(_contadores)}
+
+def imprime_resumo():
+    # Imprime o resumo ordenado pelo tempo total de cada etapa
+    # (etapas podem se sobrepor: 'templates' inclui 'carga', 'filtragem' etc.)
+    r = resumo()
+    print(f"{'etapa':<24}{'chamadas':>10}{'total (ms)':>12}{'média':>9}{'p50':>9}{'p90':>9}{'p99':>9}")
+    for etapa, e in sorted(r['etapas'].items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{etapa:<24}{e['chamadas']:>10}{e['total_ms']:>12.1f}{e['media_ms']:>9.2f}"
+              f"{e['p50_ms']:>9.2f}{e['p90_ms']:>9.2f}{e['p99_ms']:>9.2f}")
+    for nome, valor in sorted(r['contadores'].items()):
+        print(f'{nome}: {valor}')
+
+@contextmanager
+def captura(diretorio, perfil=True, memoria=True, linhas=40):
+    # Executa o bloco sob cProfile e/ou tracemalloc e grava os relatórios em `diretorio`:
+    # perfil.prof (para snakeviz/pstats), perfil.txt (funções por tempo acumulado) e
+    # memoria.txt (maiores alocações por linha e pico)
+    os.makedirs(diretorio, exist_ok=True)
+    profiler = cProfile.Profile() if perfil else None
+    if memoria:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(diretorio, 'perfil.prof'))
+            texto = io.StringIO()
+            pstats.Stats(profiler, stream=texto).sort_stats('cumulative').print_stats(linhas)
+            with open(os.path.join(diretorio, 'perfil.txt'), 'w') as f:
+                f.write(texto.getvalue())
+
+        if memoria:
+            atual, pico = tracemalloc.get_traced_memory()
+            estatisticas = tracemalloc.take_snapshot().statistics('lineno')
+            tracemalloc.stop()
+            with open(os.path.join(diretorio, 'memoria.txt'), 'w') as f:
+                f.write(f'Memória atual: {atual / 1024:.1f} KiB  pico: {pico / 1024:.1f} KiB\n\n')
+                for estatistica in estatisticas[:linhas]:
+                    f.write(f'{estatistica}\n')
@@ -0,0 +1,149 @@
+import time
+import numpy as np
+from dtw_utils import DTW_banda, envelope, lb_kim
+from classifier_report import votacao_final
+from ecg_preprocessing import cria_template
+
+class BancoExemplares:
+    # Banco de batimentos individuais de treino por derivação, com índice pré-calculado:
+    # para cada exemplar guarda o rótulo e o envelope (inferior/superior) do LB_Keogh
+    # exemplares: {derivação: array (n_exemplares, amostras)}; rotulos: {derivação: array (n_exemplares,)}
+
+    def __init__(self, exemplares, rotulos, janela=None, fracao=None):
+        self.janela = janela
+        self.fracao = fracao
+        self.exemplares = {d: np.asarray(x, dtype=np.float64) for d, x in exemplares.items()}
+        self.rotulos = {d: np.asarray(r) for d, r in rotulos.items()}
+        self.derivacoes = list(self.exemplares)
+        self.classes = sorted(set(np.concatenate(list(self.rotulos.values())).tolist()))
+
+        # Envelopes de todos os exemplares, calculados uma única vez
+        self.inferior, self.superior = {}, {}
+        for d, x in self.exemplares.items():
+            envelopes = [envelope(e, janela, fracao) for e in x]
+            self.inferior[d] = np.array([e[0] for e in envelopes])
+            self.superior[d] = np.array([e[1] for e in envelopes])
+
+    @classmethod
+    def de_armazem(cls, armazem, nomes={0: 'NORMAL', 1: 'AMI'}, selecao=None, janela=None, fracao=None):
+        # Monta o banco a partir de um ArmazemBatimentos (todos os batimentos válidos dos
+        # registros selecionados), traduzindo os rótulos numéricos pelos nomes das classes
+        if selecao is None:
+            selecao = np.ones(len(armazem), dtype=bool)
+        validos = armazem.mascara_validos()[selecao]           # (registros, derivações, batimentos)
+        dados = np.asarray(armazem.dados[selecao], dtype=np.float64)
+        labels = np.array([nomes[l] for l in armazem.labels[selecao]])
+
+        exemplares, rotulos = {}, {}
+        for l, d in enumerate(armazem.derivacoes):
+            mascara = validos[:, l]
+            exemplares[d] = dados[:, l][mascara]
+            rotulos[d] = np.repeat(labels, mascara.sum(axis=1))
+        return cls(exemplares, rotulos, janela, fracao)
+
+    def __len__(self):
+        return sum(len(x) for x in self.exemplares.values())
+
+class ClassificadorKNN:
+    # Classificador k-NN por DTW sobre um BancoExemplares
+    # Para cada derivação: calcula o LB_Keogh da consulta contra todos os envelopes de uma vez,
+    # visita os exemplares em ordem crescente de limite inferior e para assim que o limite
+    # alcança a k-ésima melhor distância; o DTW (banda do banco) é abandonado ao ultrapassá-la
+    # O voto por derivação segue para votacao_final, como no classificador por protótipos
+
+    def __init__(self, banco, k=1):
+        self.banco = banco
+        self.k = k
+        self.latencias = []
+        self.estatisticas = {'consultas': 0, 'candidatos': 0, 'podados_keogh': 0,
+                             'podados_kim': 0, 'abandonados': 0, 'dtw_completos': 0}
+
+    def vizinhos(self, batimento, derivacao):
+        # Retorna os k vizinhos mais próximos [(distância, rótulo, índice)] em ordem crescente
+        b = self.banco
+        batimento = np.asarray(batimento, dtype=np.float64)
+        x = b.exemplares[derivacao]
+
+        # LB_Keogh vetorizado contra todos os exemplares
+        excesso = (np.maximum(batimento - b.superior[derivacao], 0)
+                   + np.maximum(b.inferior[derivacao] - batimento, 0)) ** 2
+        # Sufixos acumulados do LB_Keogh: limite inferior do custo do que falta alinhar,
+        # usado pelo DTW_banda para abandonar cedo (caudas[:, 0] é o LB_Keogh completo)
+        caudas = np.zeros((len(x), excesso.shape[1] + 1))
+        caudas[:, :-1] = np.cumsum(excesso[:, ::-1], axis=1)[:, ::-1]
+        limites = np.sqrt(caudas[:, 0])
+        ordem = np.argsort(limites, kind='stable')
+
+        melhores = []  # (distância, índice), mantida ordenada com no máximo k itens
+        est = self.estatisticas
+        est['consultas'] += 1
+        est['candidatos'] += len(x)
+
+        for posicao, i in enumerate(ordem):
+            kesima = melhores[-1][0] if len(melhores) == self.k else np.inf
+
+            # Limites em ordem crescente: todos os restantes podem ser descartados
+            if limites[i] >= kesima:
+                est['podados_keogh'] += len(ordem) - posicao
+                break
+            if lb_kim(batimento, x[i]) >= kesima:
+                est['podados_kim'] += 1
+                continue
+
+            dist = DTW_banda(batimento, x[i], b.janela, b.fracao,
+                             limite=None if np.isinf(kesima) else kesima, cauda=caudas[i])
+            if np.isinf(dist) or dist >= kesima:
+                est['abandonados'] += 1
+                continue
+            est['dtw_completos'] += 1
+
+            melhores.append((dist, i))
+            melhores.sort()
+            del melhores[self.k:]
+
+        rotulos = b.rotulos[derivacao]
+        return [(dist, rotulos[i], i) for dist, i in melhores]
+
+    def classifica(self, batimentos):
+        # Classifica um conjunto de batimentos {derivação: batimento}
+        # Retorna o voto final, as classificações por derivação e, para o desempate, a menor
+        # distância a cada classe entre os vizinhos (ou a k-ésima distância, que é um limite
+        # inferior, se a classe não aparecer entre eles)
+        inicio = time.perf_counter()
+        classificacoes = {}
+        distancias = {c: {} for c in self.banco.classes}
+
+        for derivacao, batimento in batimentos.items():
+            if derivacao not in self.banco.exemplares:
+                continue
+            vizinhos = self.vizinhos(batimento, derivacao)
+
+            # Maioria entre os k vizinhos; empate decidido pelo vizinho mais próximo
+            votos = {}
+            for _, rotulo, _ in vizinhos:
+                votos[rotulo] = votos.get(rotulo, 0) + 1
+            maximo = max(votos.values())
+            classificacoes[derivacao] = next(r for _, r, _ in vizinhos if votos[r] == maximo)
+
+            for c in self.banco.classes:
+                da_classe = [dist for dist, rotulo, _ in vizinhos if rotulo == c]
+                distancias[c][derivacao] = da_classe[0] if da_classe else vizinhos[-1][0]
+
+        label = votacao_final(classificacoes, distancias.get('NORMAL'), distancias.get('AMI'))
+        self.latencias.append(time.perf_counter() - inicio)
+        return label, classificacoes, distancias
+
+    def classifica_registro(self, arquivo, path='', cache=None, canais=[6, 7, 8, 9]):
+        # Classifica o template médio de um registro, como classifica_registro de main
+        return self.classifica(cria_template(ECG_path=arquivo, canais=canais, path=path, cache=cache))
+
+    def relatorio(self):
+        # Latência por consulta (ms) e taxa de poda (fração dos exemplares sem DTW completo)
+        est = dict(self.estatisticas)
+        if est['candidatos']:
+            est['taxa_poda'] = 1 - est['dtw_completos'] / est['candidatos']
+        if self.latencias:
+            latencias = 1e3 * np.array(self.latencias)
+            est['latencia_p50_ms'] = np.percentile(latencias, 50)
+            est['latencia_p99_ms'] = np.percentile(latencias, 99)
+        return est
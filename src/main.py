@@ -1,42 +1,68 @@
-import pandas as pd
-import ast
-from ecg_preprocessing import load_ECG, clean_ECG, detect_qrs, extract_beats, mean_template, cria_template
-from classifier_report import classificar_com_base_nas_distancias, votacao_final, matriz_confusao, report
-from dtw_utils import calcular_distancias_dtw
-
-from utils import analisa_tempo
-
-def aggregate_diagnostic(y_dic, agg_df):
-    tmp = []
-    for key in y_dic.keys():
-        if key in agg_df.index:
-            tmp.append(agg_df.loc[key].diagnostic_class)
-    return list(set(tmp))
-
-def aggregate_subclass(y_dic, agg_df):
-    tmp = []
-    for key in y_dic.keys():
-        if key in agg_df.index:
-            tmp.append(agg_df.loc[key].diagnostic_subclass)
-    return list(set(tmp))
-
-def arq_interesse(path, random_state=2025):
+import numpy as np
+import hashlib
+import json
+import os
+import re
+import time
+from functools import partial
+from ecg_preprocessing import cria_template
+from classifier_report import (classificar_com_base_nas_distancias, votacao_final, empate, votacao_lote,
+                               tensor_distancias, CLASSES)
+from dtw_utils import (calcular_distancias_dtw, calcular_distancias_dtw_lote, calcular_distancias_dtw_dependente,
+                       classificar_com_poda, prepara_envelopes)
+from cache_ecg import CacheECG
+from paralelo import mapeia_em_paralelo
+import instrumentacao
+from instrumentacao import cronometro, conta
+from contextlib import nullcontext
+
+# Extrai as chaves (códigos SCP) do texto de scp_codes, ex.: "{'NORM': 100.0, 'SR': 0.0}"
+_CODIGO_SCP = re.compile(r"'([^']*)'\s*:")
+
+def _chave_metadados(path, random_state):
+    # Chave do cache de arq_interesse: caminhos e datas de modificação dos CSVs + semente
+    arquivos = [os.path.abspath(path + nome) for nome in ('ptbxl_database.csv', 'scp_statements.csv')]
+    conteudo = json.dumps([(a, os.path.getmtime(a)) for a in arquivos] + [random_state])
+    return hashlib.sha1(conteudo.encode()).hexdigest()
+
+def arq_interesse(path, random_state=2025, diretorio_cache=None):
+    # Seleciona a coorte NORM/AMI validada por humanos da PTB-XL
+    # Os códigos SCP são lidos uma única vez e mapeados para superclasse/subclasse por
+    # dicionários (sem .loc por linha); a subclasse é calculada primeiro para que a
+    # superclasse só seja calculada nas linhas que sobrevivem ao filtro
+    # Com diretorio_cache, o resultado é salvo em .npz e reaproveitado enquanto os CSVs
+    # não forem modificados; o arquivo fica no subdiretório 'metadados', fora das entradas
+    # que o CacheECG do mesmo diretório conta no seu limite e pode remover
+    if diretorio_cache:
+        arquivo_cache = os.path.join(diretorio_cache, 'metadados',
+                                     f'arq_interesse_{_chave_metadados(path, random_state)}.npz')
+        if os.path.exists(arquivo_cache):
+            return _carrega_arq_interesse(arquivo_cache)
+
+    import pandas as pd
     Y = pd.read_csv(path+'ptbxl_database.csv', index_col='ecg_id')
-    Y.scp_codes = Y.scp_codes.apply(lambda x: ast.literal_eval(x))
+    codigos = [_CODIGO_SCP.findall(x) for x in Y.scp_codes]
 
     agg_df = pd.read_csv(path+'scp_statements.csv', index_col=0)
     agg_df = agg_df[agg_df.diagnostic == 1]
+    classe = agg_df.diagnostic_class.to_dict()
+    subclasse = agg_df.diagnostic_subclass.to_dict()
 
-    # Aplicando aggregate_diagnostic com agg_df como argumento
-    Y['diagnostic_superclass'] = Y.scp_codes.apply(lambda x: aggregate_diagnostic(x, agg_df))
-    Y['diagnostic_subclass'] = Y.scp_codes.apply(lambda x: aggregate_subclass(x, agg_df))
+    # Subclasses diagnósticas (sem repetição) dos códigos SCP de cada registro
+    Y['diagnostic_subclass'] = [list(set(subclasse[k] for k in chaves if k in subclasse)) for chaves in codigos]
 
+    selecionados = (Y['diagnostic_subclass'].map(lambda x: x == ['NORM'] or x == ['AMI'])
+                    & Y['validated_by_human']).to_numpy(dtype=bool)
+    filtered_Y = Y[selecionados].copy()
 
-    filtered_Y = Y[Y['diagnostic_subclass'].apply(lambda x: x == ['NORM'] or x == ['AMI'])]
-    filtered_Y = filtered_Y[filtered_Y['validated_by_human']]
+    # Superclasses diagnósticas, calculadas apenas nas linhas filtradas
+    filtered_Y['diagnostic_superclass'] = [
+        list(set(classe[k] for k in chaves if k in classe))
+        for chaves, manter in zip(codigos, selecionados) if manter
+    ]
 
     # Cria atributo binário: 0 para NORM, 1 para MI
-    filtered_Y['label'] = filtered_Y['diagnostic_subclass'].apply(lambda x: 0 if x == ['NORM'] else 1)
+    filtered_Y['label'] = (filtered_Y['diagnostic_subclass'].str[0] != 'NORM').astype('int64')
 
     # Separa as classes
     class_0 = filtered_Y[filtered_Y['label'] == 0].sample(n=440, random_state=random_state)
@@ -44,75 +70,245 @@ def arq_interesse(path, random_state=2025):
 
     # Junta os dois subconjuntos
     final_df = pd.concat([class_0, class_1]).sort_index()
+    final_df = final_df[['filename_hr', 'diagnostic_subclass','diagnostic_superclass', 'label']]
 
-    return final_df[['filename_hr', 'diagnostic_subclass','diagnostic_superclass', 'label']]
+    if diretorio_cache:
+        _salva_arq_interesse(arquivo_cache, final_df)
 
+    return final_df
 
+def _salva_arq_interesse(arquivo, df):
+    # Salva a coorte em .npz; as colunas de listas são gravadas como texto separado por '|'
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    np.savez(arquivo,
+             ecg_id=df.index.to_numpy(),
+             filename_hr=df['filename_hr'].to_numpy(dtype=str),
+             diagnostic_subclass=np.array(['|'.join(x) for x in df['diagnostic_subclass']]),
+             diagnostic_superclass=np.array(['|'.join(x) for x in df['diagnostic_superclass']]),
+             label=df['label'].to_numpy())
 
-def main():
-    ROOT_PATH = 'PTB-XL/'
-    RANDOM_STATE = 2025
+def _carrega_arq_interesse(arquivo):
+    # Reconstrói o DataFrame salvo por _salva_arq_interesse
+    import pandas as pd
+    with np.load(arquivo) as dados:
+        df = pd.DataFrame({
+            'filename_hr': dados['filename_hr'].astype(object),
+            'diagnostic_subclass': [x.split('|') if x else [] for x in dados['diagnostic_subclass'].tolist()],
+            'diagnostic_superclass': [x.split('|') if x else [] for x in dados['diagnostic_superclass'].tolist()],
+            'label': dados['label'],
+        }, index=pd.Index(dados['ecg_id'], name='ecg_id'))
+    return df
 
-    #-------------------------------------------------------------------------------------------
 
-    PTB_XL = arq_interesse(ROOT_PATH)
-    PTB_XL_Y = PTB_XL['label']
+
+# Métodos que aceitam outra representação (PAA, Derivative DTW) antes do DTW; a poda por
+# limites inferiores e o fastdtw comparam os batimentos originais
+METODOS_REPRESENTACAO = ('dtw', 'dependente')
+
+def valida_representacao(metodo, fator_paa=1, usa_derivada=False):
+    # Recusa PAA/derivada em métodos que os ignorariam
+    if (fator_paa != 1 or usa_derivada) and metodo not in METODOS_REPRESENTACAO:
+        raise ValueError(f"fator_paa/usa_derivada não se aplicam ao método {metodo!r} "
+                         f"(só a {', '.join(METODOS_REPRESENTACAO)})")
+
+def classifica_registro(arquivo, prototipos, path='', cache=None, metodo='dtw', envelopes=None,
+                        fator_paa=1, usa_derivada=False):
+    # Classifica um registro de teste contra os protótipos e retorna o voto final,
+    # o tempo médio por comparação e, no modo com poda, as estatísticas de poda
+    # fator_paa / usa_derivada: representação (PAA, Derivative DTW) antes do DTW nos
+    # métodos 'dtw' e 'dependente' (ValueError nos demais)
+    # Definida no nível do módulo para poder ser executada em um pool de processos
+    valida_representacao(metodo, fator_paa, usa_derivada)
+    proto_target = cria_template(ECG_path=arquivo, canais=[6,7,8,9], path=path, cache=cache)
+    estatisticas = None
+
+    dist_normal = dist_ami = None
+
+    if metodo == 'poda':
+        # Cascata LB_Kim -> LB_Keogh -> DTW com abandono antecipado
+        inicio = time.time()
+        classificacoes, estatisticas = classificar_com_poda(proto_target, prototipos, envelopes)
+        tempo = time.time() - inicio
+        # As distâncias completas só são necessárias para desempatar a votação
+        if empate(classificacoes):
+            distancias, _ = calcular_distancias_dtw_lote(proto_target, prototipos)
+            dist_normal, dist_ami = distancias['NORMAL'], distancias['AMI']
+    elif metodo == 'dependente':
+        # DTW multivariado: todas as derivações alinhadas por um único caminho, uma
+        # distância por classe; vence a classe do protótipo mais próximo (empate: a última
+        # classe de CLASSES, como em votacao_lote)
+        distancias, tempo = calcular_distancias_dtw_dependente(proto_target, prototipos, fator_paa=fator_paa,
+                                                               usa_derivada=usa_derivada)
+        return min(reversed(CLASSES), key=distancias.get), tempo, estatisticas
+    elif metodo == 'fastdtw':
+        dist_normal, tempo_normal = calcular_distancias_dtw(proto_target, prototipos['NORMAL'], fastDTW=True)
+        dist_ami, tempo_ami = calcular_distancias_dtw(proto_target, prototipos['AMI'], fastDTW=True)
+        tempo = (tempo_normal + tempo_ami) / 2
+        classificacoes = classificar_com_base_nas_distancias(dist_normal, dist_ami)
+    else:
+        # Compara o registro com todos os protótipos em uma única chamada
+        distancias, tempo = calcular_distancias_dtw_lote(proto_target, prototipos, fator_paa, usa_derivada)
+        dist_normal, dist_ami = distancias['NORMAL'], distancias['AMI']
+        classificacoes = classificar_com_base_nas_distancias(dist_normal, dist_ami)
+
+    return votacao_final(classificacoes, dist_normal, dist_ami), tempo, estatisticas
+
+def distancias_registro(arquivo, prototipos, path='', cache=None, fator_paa=1, usa_derivada=False):
+    # Distâncias DTW do registro a todos os protótipos como array (classes x derivações),
+    # com as classes na ordem de CLASSES, e o tempo médio por comparação
+    proto_target = cria_template(ECG_path=arquivo, canais=[6,7,8,9], path=path, cache=cache)
+    distancias, tempo = calcular_distancias_dtw_lote(proto_target, prototipos, fator_paa, usa_derivada)
+    return tensor_distancias([distancias])[0], tempo
+
+def avalia(X_test, y_test, prototipos, path, cache, metodo, n_workers=1, chunksize=None, arquivo_distancias=None,
+           fator_paa=1, usa_derivada=False):
+    # Classifica todos os registros de teste (em paralelo se n_workers > 1) e gera os relatórios
+    # No método 'dtw' as distâncias de todos os registros formam um array (registros x classes
+    # x derivações) decidido de uma só vez por votacao_lote; com arquivo_distancias ele é
+    # salvo (.npy) para avaliar outras regras de decisão sem refazer o DTW
+    # fator_paa / usa_derivada: como em classifica_registro
+    valida_representacao(metodo, fator_paa, usa_derivada)
+    if metodo == 'dtw':
+        calcula = partial(distancias_registro, prototipos=prototipos, path=path, cache=cache,
+                          fator_paa=fator_paa, usa_derivada=usa_derivada)
+        with cronometro(f'avaliacao_{metodo}'):
+            resultados = mapeia_em_paralelo(calcula, X_test['filename_hr'], n_workers, chunksize)
+        distancias = np.stack([r[0] for r in resultados])
+        if arquivo_distancias:
+            np.save(arquivo_distancias, distancias)
+        predicoes = [CLASSES[i] for i in votacao_lote(distancias)['rotulos']]
+    else:
+        envelopes = prepara_envelopes(prototipos) if metodo == 'poda' else None
+        classifica = partial(classifica_registro, prototipos=prototipos, path=path, cache=cache,
+                             metodo=metodo, envelopes=envelopes, fator_paa=fator_paa, usa_derivada=usa_derivada)
+        with cronometro(f'avaliacao_{metodo}'):
+            resultados = mapeia_em_paralelo(classifica, X_test['filename_hr'], n_workers, chunksize)
+        predicoes = [r[0] for r in resultados]
+    conta(f'registros_teste_{metodo}', len(resultados))
+
+    tempos = [r[1] for r in resultados]
+
+    if metodo == 'poda':
+        comparacoes = sum(r[2]['comparacoes'] for r in resultados)
+        podadas = comparacoes - sum(r[2]['completas'] for r in resultados)
+        print(f'DTW completos evitados: {podadas} de {comparacoes}')
+
+    y_pred = y_test.copy()  # evita alteração direta se y_test for um slice
+    y_pred['predict'] = predicoes
+    y_pred['predict'] = y_pred['predict'].map({'NORMAL': 0, 'AMI': 1})
+
+    # Dependências de gráficos e relatórios carregadas só aqui
+    from classifier_report import matriz_confusao, report
+    from utils import analisa_tempo
+
+    matriz_confusao(y_pred)
+    analisa_tempo(tempos)
+    report(y_pred['label'], y_pred['predict'])
+
+    return y_pred
+
+def compara_representacoes(X_test, y_test, prototipos, path, cache, fatores=(1, 2, 4, 8),
+                           derivadas=(False, True), metodo='dtw', n_workers=1, chunksize=None):
+    # Compara velocidade e métricas de classificação (classifier_report.report) para cada
+    # combinação de fator de PAA e Derivative DTW; retorna uma linha por configuração
+    from classifier_report import report
+
+    for usa_derivada in derivadas:
+        for fator in fatores:
+            valida_representacao(metodo, fator, usa_derivada)
+
+    linhas = []
+    for usa_derivada in derivadas:
+        for fator in fatores:
+            classifica = partial(classifica_registro, prototipos=prototipos, path=path, cache=cache,
+                                 metodo=metodo, fator_paa=fator, usa_derivada=usa_derivada)
+            resultados = mapeia_em_paralelo(classifica, X_test['filename_hr'], n_workers, chunksize)
+            predicoes = [{'NORMAL': 0, 'AMI': 1}[r[0]] for r in resultados]
+
+            print(f'---------- PAA {fator}x{" + derivada" if usa_derivada else ""} ----------')
+            metricas = report(y_test['label'], predicoes)
+            linhas.append({
+                'fator_paa': fator, 'derivada': usa_derivada,
+                'tempo_medio_s': float(np.mean([r[1] for r in resultados])),
+                'celulas_relativas': 1 / fator ** 2,
+                'acuracia': metricas['accuracy'],
+                'f1_macro': metricas['macro avg']['f1-score'],
+            })
+
+    base = linhas[0]['tempo_medio_s']
+    print(f"{'PAA':>4} {'derivada':>9} {'tempo (ms)':>11} {'ganho':>7} {'células':>8} {'acurácia':>9} {'f1 macro':>9}")
+    for l in linhas:
+        print(f"{l['fator_paa']:>4} {str(l['derivada']):>9} {1e3 * l['tempo_medio_s']:>11.3f} "
+              f"{base / l['tempo_medio_s']:>6.1f}x {l['celulas_relativas']:>8.3f} "
+              f"{l['acuracia']:>9.3f} {l['f1_macro']:>9.3f}")
+    return linhas
+
+def divide_treino_teste(raiz, random_state=2025, diretorio_cache=None, test_size=0.1):
+    # Coorte de arq_interesse dividida em treino e teste (rótulos como DataFrame com a coluna 'label')
+    from sklearn.model_selection import train_test_split
+
+    PTB_XL = arq_interesse(raiz, random_state, diretorio_cache)
+    PTB_XL_Y = PTB_XL[['label']]
     PTB_XL_X = PTB_XL.drop('label', axis=1)
 
-    X_train, X_test, y_train, y_test = train_test_split(PTB_XL_X, PTB_XL_Y,
-                                                        test_size=0.1,
-                                                        random_state= RANDOM_STATE)
+    return train_test_split(PTB_XL_X, PTB_XL_Y, test_size=test_size, random_state=random_state)
 
+def constroi_prototipos(X_train, y_train, raiz, cache=None, n_workers=1, chunksize=None, template=None):
+    # Protótipos {classe: {derivação: template}} a partir dos registros de treino
+    # Templates construídos em paralelo (n_workers processos) quando solicitado
     NORM = X_train[y_train['label'] == 0]
     AMI = X_train[y_train['label'] == 1]
 
-    proto_norm = cria_template(df=NORM, ref_template=True)
-    proto_ami = cria_template(df=AMI, ref_template=True)
+    with cronometro('templates'):
+        proto_norm = cria_template(df=NORM, ref_template=True, path=raiz, cache=cache,
+                                   n_workers=n_workers, chunksize=chunksize, template=template)
+        proto_ami = cria_template(df=AMI, ref_template=True, path=raiz, cache=cache,
+                                  n_workers=n_workers, chunksize=chunksize, template=template)
+    return {'NORMAL': proto_norm, 'AMI': proto_ami}
+
+def main(poda=False, diretorio_cache='cache_ecg', n_workers=1, chunksize=None, instrumentar=False, perfil=None,
+         dependente=False, raiz='PTB-XL/'):
+    # dependente: avalia também o DTW multivariado dependente (um caminho para todas as derivações)
+    # instrumentar: coleta tempos por etapa e contadores e imprime o resumo ao final
+    # perfil: diretório onde gravar os relatórios de cProfile e tracemalloc
+    # (com n_workers > 1, apenas o trabalho do processo principal é medido)
+    if instrumentar or perfil:
+        instrumentacao.ativa()
 
+    with instrumentacao.captura(perfil) if perfil else nullcontext():
+        experimento(poda, diretorio_cache, n_workers, chunksize, dependente, raiz)
+
+    if instrumentar or perfil:
+        instrumentacao.imprime_resumo()
+
+def experimento(poda=False, diretorio_cache='cache_ecg', n_workers=1, chunksize=None, dependente=False,
+                raiz='PTB-XL/'):
+    RANDOM_STATE = 2025
+
+    # Cache dos sinais filtrados e batimentos: as fases DTW e FastDTW (e execuções
+    # repetidas) reaproveitam o pré-processamento em vez de reler os registros
+    cache = CacheECG(diretorio_cache) if diretorio_cache else None
+
+    #-------------------------------------------------------------------------------------------
+
+    X_train, X_test, y_train, y_test = divide_treino_teste(raiz, RANDOM_STATE, diretorio_cache)
+    prototipos = constroi_prototipos(X_train, y_train, raiz, cache, n_workers, chunksize)
 
     #---------- DTW ----------
-    predicoes = []
-    tempo_normal = tempo_ami = []
-    for idx, row in X_test.iterrows():
-        proto_target = cria_template(ECG_path=row['filename_hr'], canais=[6,7,8,9])
-        dist_normal, tempo = calcular_distancias_dtw(proto_target, proto_norm)
-        tempo_normal.append(tempo)
-        dist_ami, tempo = calcular_distancias_dtw(proto_target, proto_ami)
-        tempo_ami.append(tempo)
-        resultado = votacao_final(classificar_com_base_nas_distancias(dist_normal, dist_ami))
-        predicoes.append(resultado)
-
-    y_dtw = y_test.copy()  # evita alteração direta se y_test for um slice
-    y_dtw['predict'] = predicoes
-    y_dtw['predict'] = y_dtw['predict'].replace({'NORMAL': 0, 'AMI': 1})
-
-    matriz_confusao(y_dtw)
-    analisa_tempo(tempo_normal)
-    analisa_tempo(tempo_ami)
-    report(y_dtw['label'], y_dtw['predict'])
+    avalia(X_test, y_test, prototipos, raiz, cache, 'poda' if poda else 'dtw', n_workers, chunksize)
+
+    #---------- DTW multivariado dependente ----------
+    if dependente:
+        avalia(X_test, y_test, prototipos, raiz, cache, 'dependente', n_workers, chunksize)
 
     #---------- FastDTW ----------
-    predicoes = []
-    tempo_normal = tempo_ami = []
-    for idx, row in X_test.iterrows():
-        proto_target = cria_template(ECG_path=row['filename_hr'], canais=[6,7,8,9])
-        dist_normal, tempo = calcular_distancias_dtw(proto_target, proto_norm, fastDTW=True)
-        tempo_normal.append(tempo)
-        dist_ami, tempo = calcular_distancias_dtw(proto_target, proto_ami, fastDTW=True)
-        tempo_ami.append(tempo)
-        resultado = votacao_final(classificar_com_base_nas_distancias(dist_normal, dist_ami))
-        predicoes.append(resultado)
-    
-    y_fastdtw = y_test.copy()  # evita alteração direta se y_test for um slice
-    y_fastdtw['predict'] = predicoes
-    y_fastdtw['predict'] = y_fastdtw['predict'].replace({'NORMAL': 0, 'AMI': 1})
-
-    matriz_confusao(y_fastdtw)
-    analisa_tempo(tempo_normal)
-    analisa_tempo(tempo_ami)
-    report(y_fastdtw['label'], y_fastdtw['predict'])
+    avalia(X_test, y_test, prototipos, raiz, cache, 'fastdtw', n_workers, chunksize)
+
+    # Os contadores refletem apenas o processo principal quando n_workers > 1
+    if cache is not None:
+        print(f'Cache: {cache.estatisticas()}')
 
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+from functools import partial
+import numpy as np
+from dtw_utils import ENGINES, DTW_lote, fastdtw_custom
+from paralelo import itera_em_paralelo
+
+# Matriz de distâncias DTW entre todos os pares de um conjunto de batimentos
+# Só o triângulo superior é calculado (a matriz é simétrica), dividido em blocos de
+# tamanho_bloco x tamanho_bloco distribuídos em um pool de processos. Cada bloco é gravado
+# (com o seu espelho no triângulo inferior) em um .npy aberto com np.memmap assim que fica
+# pronto; células ainda não calculadas valem NaN, então uma execução interrompida continua
+# de onde parou ao ser chamada de novo com o mesmo arquivo
+
+def _funcao_distancia(engine):
+    # Motores aceitos: nomes de ENGINES, 'lote' (DTW_lote, uma linha do bloco por chamada),
+    # 'fastdtw' ou uma função f(x, y) definida no nível do módulo (para ir aos processos)
+    # 'lote' (o padrão) é exato; 'banda' e 'fastdtw' são aproximados (ver APROXIMADOS)
+    if callable(engine):
+        return engine
+    if engine == 'fastdtw':
+        return partial(fastdtw_custom, radius=2)
+    if engine == 'lote' or engine in ENGINES:
+        return ENGINES.get(engine)
+    raise ValueError(f"engine desconhecido: {engine!r} (opções: {list(ENGINES) + ['lote', 'fastdtw']})")
+
+def _calcula_bloco(bloco, engine):
+    # Distâncias entre as linhas e as colunas de um bloco
+    # bloco: (i0, j0, batimentos das linhas, batimentos das colunas)
+    i0, j0, linhas, colunas = bloco
+    distancias = np.full((len(linhas), len(colunas)), np.nan)
+
+    for a, x in enumerate(linhas):
+        # No bloco da diagonal basta o triângulo superior (i < j)
+        inicio = max(0, i0 + a + 1 - j0)
+        if inicio >= len(colunas):
+            continue
+        if engine == 'lote':
+            distancias[a, inicio:] = DTW_lote(x, colunas[inicio:, None, :])[:, 0]
+        else:
+            funcao = _funcao_distancia(engine)
+            distancias[a, inicio:] = [funcao(x, y) for y in colunas[inicio:]]
+    return i0, j0, distancias
+
+def _assinatura(batimentos, engine):
+    # Identifica o conjunto de batimentos e o motor, para não retomar um arquivo de outro cálculo
+    h = hashlib.sha1(np.ascontiguousarray(batimentos).tobytes())
+    h.update(repr(batimentos.shape).encode())
+    return {'sha1': h.hexdigest(), 'engine': engine if isinstance(engine, str) else
+            f'{engine.__module__}.{getattr(engine, "__qualname__", repr(engine))}'}
+
+def matriz_distancias(batimentos, arquivo, engine='lote', tamanho_bloco=64, n_workers=1, chunksize=1):
+    # Calcula (ou completa) a matriz simétrica (N x N) de distâncias DTW entre os batimentos
+    # (N x amostras) e a retorna aberta como memmap; `arquivo` é um .npy e ao lado dele fica
+    # um .json com a assinatura dos dados e do motor
+    batimentos = np.asarray(batimentos, dtype=np.float64)
+    _funcao_distancia(engine)  # Valida o motor antes de criar arquivos
+    n = len(batimentos)
+    assinatura = _assinatura(batimentos, engine)
+    arquivo_assinatura = os.path.splitext(arquivo)[0] + '.json'
+
+    # Sem a assinatura (ex.: interrompido antes de gravá-la) não há como saber de que cálculo
+    # é o .npy, então ele é tratado como não assinado e recalculado do zero
+    salva = None
+    if os.path.exists(arquivo):
+        try:
+            with open(arquivo_assinatura) as f:
+                salva = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        if salva is not None and salva != assinatura:
+            raise ValueError(f"{arquivo} foi calculado para outros batimentos ou outro motor")
+
+    if salva is not None:
+        matriz = np.lib.format.open_memmap(arquivo, mode='r+')
+    else:
+        matriz = np.lib.format.open_memmap(arquivo, mode='w+', dtype=np.float64, shape=(n, n))
+        matriz[:] = np.nan
+        np.fill_diagonal(matriz, 0.0)
+        matriz.flush()
+        with open(arquivo_assinatura, 'w') as f:
+            json.dump(assinatura, f)
+
+    # Blocos do triângulo superior que ainda têm células pendentes
+    # (o espelho é gravado por último, então um bloco só conta como pronto se ele estiver completo)
+    inicios = range(0, n, tamanho_bloco)
+    pendentes = [
+        (i0, j0, batimentos[i0:i0 + tamanho_bloco], batimentos[j0:j0 + tamanho_bloco])
+        for i0 in inicios for j0 in inicios
+        if j0 >= i0 and np.isnan(matriz[j0:j0 + tamanho_bloco, i0:i0 + tamanho_bloco]).any()
+    ]
+
+    calcula = partial(_calcula_bloco, engine=engine)
+    for i0, j0, distancias in itera_em_paralelo(calcula, pendentes, n_workers, chunksize):
+        i1, j1 = i0 + distancias.shape[0], j0 + distancias.shape[1]
+        if i0 == j0:
+            # Bloco da diagonal: só o triângulo superior foi calculado
+            superior = np.triu(np.nan_to_num(distancias), k=1)
+            distancias = superior + superior.T
+        matriz[i0:i1, j0:j1] = distancias
+        matriz[j0:j1, i0:i1] = distancias.T
+        matriz.flush()
+
+    return matriz
+
+def medoide(matriz):
+    # Índice do medoide: o elemento com a menor soma de distâncias aos demais
+    return int(np.argmin(np.sum(matriz, axis=1)))
+
+def medoid_template(segments, engine='lote', diretorio=None, n_workers=1, tamanho_bloco=64):
+    # Alternativa a mean_template: em vez da média ponto a ponto (que borra batimentos
+    # desalinhados), usa o batimento real mais central segundo o DTW
+    # Com `diretorio`, a matriz de distâncias fica em disco (nome derivado da assinatura dos
+    # batimentos) e pode ser retomada; sem ele, é calculada em um arquivo temporário
+    # Pode ser passada a cria_template: cria_template(..., template=partial(medoid_template, ...))
+    batimentos = np.vstack(segments).astype(np.float64)
+    if len(batimentos) == 1:
+        return batimentos[0]
+
+    if diretorio is None:
+        with tempfile.TemporaryDirectory() as temporario:
+            return medoid_template(batimentos, engine, temporario, n_workers, tamanho_bloco)
+
+    os.makedirs(diretorio, exist_ok=True)
+    chave = hashlib.sha1(json.dumps(_assinatura(batimentos, engine), sort_keys=True).encode()).hexdigest()
+    arquivo = os.path.join(diretorio, f'dtw_{chave[:16]}.npy')
+    matriz = matriz_distancias(batimentos, arquivo, engine, tamanho_bloco, n_workers)
+    return batimentos[medoide(matriz)]
@@ -0,0 +1,38 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def numero_workers(n_workers=None):
+    # None ou 0 usa todos os núcleos disponíveis; valores negativos deixam núcleos livres
+    total = os.cpu_count() or 1
+    if not n_workers:
+        return total
+    if n_workers < 0:
+        return max(1, total + n_workers)
+    return n_workers
+
+def mapeia_em_paralelo(funcao, itens, n_workers=1, chunksize=None):
+    # Aplica a função a cada item em um pool de processos e devolve os resultados na
+    # mesma ordem dos itens, de modo que a saída seja idêntica à execução serial
+    # A função deve ser definida no nível do módulo (ou ser um functools.partial dela)
+    # para poder ser enviada aos processos
+    return list(itera_em_paralelo(funcao, itens, n_workers, chunksize))
+
+def itera_em_paralelo(funcao, itens, n_workers=1, chunksize=None):
+    # Como mapeia_em_paralelo, mas entrega cada resultado (em ordem) assim que fica pronto,
+    # para que quem chama possa gravá-lo de forma incremental
+    itens = list(itens)
+    n_workers = numero_workers(n_workers)
+
+    # Execução serial: sem custo de criar processos
+    if n_workers == 1 or len(itens) <= 1:
+        for item in itens:
+            yield funcao(item)
+        return
+
+    # Blocos de itens por tarefa: ~4 blocos por worker equilibra carga e custo de comunicação
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(itens) / (4 * n_workers)))
+
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(itens))) as executor:
+        yield from executor.map(funcao, itens, chunksize=chunksize)
@@ -0,0 +1,110 @@
+import math
+from functools import partial
+import numpy as np
+from ecg_preprocessing import processa_registro, DERIVACOES
+from paralelo import itera_em_paralelo, numero_workers
+
+class AcumuladorPrototipos:
+    # Protótipos médios mantidos de forma incremental: para cada (classe, derivação) guarda
+    # apenas o número de batimentos, a média e a soma dos quadrados dos desvios (Welford),
+    # então a memória não depende do número de registros
+    # Acumuladores de partes diferentes da coorte (ex.: um por worker) podem ser mesclados,
+    # e o resultado é o mesmo (a menos de arredondamento) de mean_template sobre tudo
+
+    def __init__(self):
+        self.estado = {}  # {classe: {derivação: (n, média, m2)}}
+
+    def adiciona(self, classe, batimentos):
+        # Acrescenta batimentos {derivação: array (batimentos, amostras)} à classe
+        for d, beats in batimentos.items():
+            beats = np.asarray(beats, dtype=np.float64)
+            if len(beats) == 0:
+                continue
+            media = beats.mean(axis=0)
+            self._combina(classe, d, len(beats), media, ((beats - media) ** 2).sum(axis=0))
+
+    def _combina(self, classe, d, n_b, media_b, m2_b):
+        # Combinação de duas partes (Chan et al.): média e m2 do conjunto unido
+        por_derivacao = self.estado.setdefault(classe, {})
+        if d not in por_derivacao:
+            por_derivacao[d] = (n_b, media_b.copy(), m2_b.copy())
+            return
+        n_a, media_a, m2_a = por_derivacao[d]
+        n = n_a + n_b
+        delta = media_b - media_a
+        por_derivacao[d] = (n, media_a + delta * (n_b / n), m2_a + m2_b + delta ** 2 * (n_a * n_b / n))
+
+    def adiciona_registro(self, arquivo, classe, canais=[6, 7, 8, 9], path='', cache=None, **parametros):
+        # Processa um registro e acrescenta os seus batimentos à classe
+        registro = processa_registro(path + arquivo, canais, cache=cache, **parametros)
+        self.adiciona(classe, {DERIVACOES[c]: beats for c, (_, beats) in registro.items()})
+
+    def mescla(self, outro):
+        # Incorpora outro acumulador (ex.: de outro worker) a este
+        for classe, por_derivacao in outro.estado.items():
+            for d, (n, media, m2) in por_derivacao.items():
+                self._combina(classe, d, n, media, m2)
+        return self
+
+    def prototipos(self):
+        # {classe: {derivação: template médio}}, no formato usado pelos classificadores
+        return {classe: {d: media for d, (_, media, _) in por_derivacao.items()}
+                for classe, por_derivacao in self.estado.items()}
+
+    def variancias(self):
+        # Variância (populacional) por amostra de cada template
+        return {classe: {d: m2 / n for d, (n, _, m2) in por_derivacao.items()}
+                for classe, por_derivacao in self.estado.items()}
+
+    def contagens(self):
+        # Número de batimentos acumulados por classe e derivação
+        return {classe: {d: n for d, (n, _, _) in por_derivacao.items()}
+                for classe, por_derivacao in self.estado.items()}
+
+    def salva(self, arquivo):
+        # Salva o estado em .npz (chaves 'classe/derivação/campo')
+        dados = {}
+        for classe, por_derivacao in self.estado.items():
+            for d, (n, media, m2) in por_derivacao.items():
+                dados[f'{classe}/{d}/n'] = n
+                dados[f'{classe}/{d}/media'] = media
+                dados[f'{classe}/{d}/m2'] = m2
+        np.savez(arquivo, **dados)
+
+    @classmethod
+    def carrega(cls, arquivo):
+        # Lê um acumulador salvo por salva
+        acumulador = cls()
+        with np.load(arquivo) as dados:
+            for chave in dados.files:
+                classe, d, campo = chave.rsplit('/', 2)
+                if campo == 'n':
+                    acumulador.estado.setdefault(classe, {})[d] = (
+                        int(dados[chave]), dados[f'{classe}/{d}/media'], dados[f'{classe}/{d}/m2'])
+        return acumulador
+
+def _acumula_parte(itens, canais, path, cache, parametros):
+    # Acumulador de uma parte da coorte: itens é uma lista de (arquivo, classe)
+    acumulador = AcumuladorPrototipos()
+    for arquivo, classe in itens:
+        acumulador.adiciona_registro(arquivo, classe, canais, path, cache, **parametros)
+    return acumulador
+
+def acumula_registros(arquivos, classes, canais=[6, 7, 8, 9], path='', cache=None, acumulador=None,
+                      n_workers=1, partes=None, **parametros):
+    # Acrescenta os registros (listas paralelas de arquivos e classes) a um acumulador
+    # (novo, se não informado); com n_workers > 1 cada worker acumula uma parte da coorte
+    # e os resultados parciais são mesclados, então só `partes` acumuladores vão e voltam
+    # dos processos e a memória não cresce com o número de registros
+    itens = list(zip(arquivos, classes))
+    if acumulador is None:
+        acumulador = AcumuladorPrototipos()
+    if partes is None:
+        partes = 4 * numero_workers(n_workers) if n_workers != 1 else 1
+    tamanho = max(1, math.ceil(len(itens) / partes))
+
+    acumula = partial(_acumula_parte, canais=canais, path=path, cache=cache, parametros=parametros)
+    blocos = [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+    for parcial in itera_em_paralelo(acumula, blocos, n_workers, chunksize=1):
+        acumulador.mescla(parcial)
+    return acumulador
@@ -0,0 +1,165 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dtw_utils import DTW_lote, classificar_com_poda, prepara_envelopes
+from classifier_report import classificar_com_base_nas_distancias, votacao_final, empate, CLASSES
+from ecg_preprocessing import cria_template
+
+def salva_prototipos(prototipos, arquivo):
+    # Salva {classe: {derivação: protótipo}} em um único .npz (chaves 'classe/derivação')
+    np.savez(arquivo, **{f'{classe}/{d}': p for classe, protos in prototipos.items() for d, p in protos.items()})
+
+def carrega_prototipos(arquivo):
+    # Lê os protótipos salvos por salva_prototipos
+    prototipos = {}
+    with np.load(arquivo) as dados:
+        for chave in dados.files:
+            classe, d = chave.split('/', 1)
+            prototipos.setdefault(classe, {})[d] = dados[chave]
+    return prototipos
+
+class ClassificadorServico:
+    # Classificador de longa duração: carrega os protótipos uma única vez, deixa prontos o
+    # tensor (classes x derivações x amostras) usado por DTW_lote e os envelopes do LB_Keogh,
+    # e atende batimentos ou registros por uma fila de um pool de threads
+    # Cada requisição retorna as distâncias por derivação, as classificações, o voto final e
+    # as latências (espera na fila + processamento)
+    # Métodos: 'dtw' (DTW_lote exato) e 'poda' (classificar_com_poda); a votação é a de
+    # votacao_final, então os protótipos devem ter exatamente as classes de CLASSES
+
+    METODOS = ('dtw', 'poda')
+
+    def __init__(self, prototipos, n_threads=4, metodo='dtw', path='', cache=None):
+        if isinstance(prototipos, str):
+            prototipos = carrega_prototipos(prototipos)
+        if metodo not in self.METODOS:
+            raise ValueError(f"método não suportado pelo serviço: {metodo!r} (opções: {', '.join(self.METODOS)})")
+        if set(prototipos) != set(CLASSES):
+            raise ValueError(f"os protótipos devem ter as classes {', '.join(CLASSES)} (recebidas: {', '.join(prototipos)})")
+
+        # Classes na ordem de CLASSES: os desempates favorecem a última
+        self.classes = list(CLASSES)
+        self.prototipos = {c: prototipos[c] for c in self.classes}
+        self.metodo = metodo
+        self.path = path
+        self.cache = cache
+        self.derivacoes = [d for d in self.prototipos[self.classes[0]]
+                           if all(d in self.prototipos[c] for c in self.classes)]
+
+        # Pré-cálculos feitos uma única vez
+        self._referencias = np.stack([
+            np.stack([np.asarray(self.prototipos[c][d], dtype=np.float64) for d in self.derivacoes])
+            for c in self.classes
+        ])
+        self._envelopes = prepara_envelopes(self.prototipos) if metodo == 'poda' else None
+
+        self._executor = ThreadPoolExecutor(max_workers=n_threads)
+        self._trava = threading.Lock()
+        self._latencias = []
+        self._inicio = None
+        self._concluidas = 0
+
+    def classifica_batimentos(self, batimentos):
+        # Classifica um conjunto de batimentos {derivação: batimento} (chamada síncrona)
+        consultas = np.stack([np.asarray(batimentos[d], dtype=np.float64) for d in self.derivacoes])
+
+        if self.metodo == 'poda':
+            classificacoes, estatisticas = classificar_com_poda(batimentos, self.prototipos, self._envelopes)
+            distancias = None
+            # As distâncias completas só são necessárias para desempatar a votação
+            if empate(classificacoes):
+                distancias = self._distancias(consultas)
+            return {'distancias': distancias, 'classificacoes': classificacoes,
+                    'label': self._vota(classificacoes, distancias), 'poda': estatisticas}
+
+        distancias = self._distancias(consultas)
+        classificacoes = classificar_com_base_nas_distancias(*(distancias[c] for c in self.classes))
+
+        return {'distancias': distancias, 'classificacoes': classificacoes,
+                'label': self._vota(classificacoes, distancias)}
+
+    def _distancias(self, consultas):
+        # Distâncias DTW de todas as derivações contra todos os protótipos em uma chamada
+        matriz = DTW_lote(consultas, self._referencias)
+        return {c: dict(zip(self.derivacoes, matriz[i])) for i, c in enumerate(self.classes)}
+
+    def _vota(self, classificacoes, distancias):
+        if distancias is None:
+            return votacao_final(classificacoes)
+        return votacao_final(classificacoes, *(distancias[c] for c in self.classes))
+
+    def classifica_registro(self, arquivo):
+        # Carrega e pré-processa um registro e classifica o seu template médio (chamada síncrona)
+        canais = [6, 7, 8, 9]
+        batimentos = cria_template(ECG_path=arquivo, canais=canais, path=self.path, cache=self.cache)
+        return self.classifica_batimentos(batimentos)
+
+    def _executa(self, funcao, item, enviado):
+        # Executa a requisição em uma thread do pool e anota as latências
+        inicio = time.perf_counter()
+        resultado = funcao(item)
+        fim = time.perf_counter()
+
+        resultado['latencia_fila'] = inicio - enviado
+        resultado['latencia_processamento'] = fim - inicio
+        resultado['latencia'] = fim - enviado
+        with self._trava:
+            self._latencias.append(fim - enviado)
+            self._concluidas += 1
+        return resultado
+
+    def submete(self, item):
+        # Coloca um registro (caminho) ou um dicionário de batimentos na fila e retorna um Future
+        enviado = time.perf_counter()
+        with self._trava:
+            if self._inicio is None:
+                self._inicio = enviado
+        funcao = self.classifica_registro if isinstance(item, str) else self.classifica_batimentos
+        return self._executor.submit(self._executa, funcao, item, enviado)
+
+    def estatisticas(self):
+        # Vazão sustentada e percentis de latência (em ms) das requisições concluídas
+        with self._trava:
+            latencias = np.array(self._latencias)
+            duracao = time.perf_counter() - self._inicio if self._inicio is not None else 0.0
+            concluidas = self._concluidas
+
+        if concluidas == 0:
+            return {'concluidas': 0}
+        return {
+            'concluidas': concluidas,
+            'vazao_por_s': concluidas / duracao if duracao > 0 else float('inf'),
+            'latencia_p50_ms': 1e3 * np.percentile(latencias, 50),
+            'latencia_p99_ms': 1e3 * np.percentile(latencias, 99),
+            'latencia_max_ms': 1e3 * latencias.max(),
+        }
+
+    def encerra(self):
+        # Aguarda as requisições pendentes e libera as threads
+        self._executor.shutdown(wait=True)
+
+def replay(servico, arquivos, taxa=10.0, repeticoes=1):
+    # Alimenta o serviço com registros a uma taxa fixa (registros por segundo) e mede
+    # vazão e latência; taxa=None envia tudo de uma vez (vazão máxima)
+    futuros = []
+    intervalo = 1.0 / taxa if taxa else 0.0
+    proximo = time.perf_counter()
+
+    for _ in range(repeticoes):
+        for arquivo in arquivos:
+            # Espera até o instante programado para o próximo envio
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            futuros.append(servico.submete(arquivo))
+            proximo += intervalo
+
+    resultados = [f.result() for f in futuros]
+    estatisticas = servico.estatisticas()
+
+    print(f"Replay: {estatisticas['concluidas']} registros a {taxa or 'máx.'} reg/s  "
+          f"vazão: {estatisticas['vazao_por_s']:.1f} reg/s  "
+          f"p50: {estatisticas['latencia_p50_ms']:.1f} ms  p99: {estatisticas['latencia_p99_ms']:.1f} ms")
+
+    return resultados, estatisticas
@@ -0,0 +1,28 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Os módulos do projeto ficam em src/ e são importados pelo nome (como em main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+def ecg_sintetico(segundos=10, fs=500, n_canais=4, seed=0):
+    # Sinal [n_amostras, n_canais] com QRS gaussianos a ~70 bpm, onda T, deriva de linha de
+    # base e ruído; cada canal com amplitude e deriva próprias
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(segundos * fs)) / fs
+    rr = 60 / rng.uniform(60, 80)
+    picos = np.arange(rng.uniform(0.2, 0.6), segundos, rr)
+    sinal = np.zeros((len(t), n_canais))
+    for c in range(n_canais):
+        amplitude = rng.uniform(0.5, 2.0)
+        for p in picos:
+            sinal[:, c] += amplitude * np.exp(-((t - p) / 0.012) ** 2)
+            sinal[:, c] += 0.3 * amplitude * np.exp(-((t - p - 0.25) / 0.05) ** 2)
+        sinal[:, c] += rng.uniform(0.2, 1.0) * np.sin(2 * np.pi * rng.uniform(0.1, 0.3) * t + rng.uniform(0, 6))
+        sinal[:, c] += 0.02 * rng.standard_normal(len(t))
+    return sinal
+
+@pytest.fixture
+def ecg():
+    return ecg_sintetico
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from armazem_batimentos import ArmazemBatimentos, salva_armazem
+
+def _armazem(tmp_path, labels):
+    rng = np.random.default_rng(0)
+    forma = (3, 2, 4, 10)  # registros, derivações, batimentos, amostras
+    dados = rng.standard_normal(forma).astype(np.float32)
+    contagens = np.array([[4, 2], [3, 4], [1, 1]])
+    cabecalho = {'forma': forma, 'canais': [6, 7], 'derivacoes': ['V1', 'V2'], 'ids': ['1', '2', '3'],
+                 'arquivos': ['a', 'b', 'c'], 'labels': labels, 'contagens': contagens.tolist(),
+                 'parametros': {}}
+    salva_armazem(tmp_path / 'armazem.bin', dados, cabecalho)
+    return ArmazemBatimentos(tmp_path / 'armazem.bin')
+
+def _media(armazem, registros):
+    return {d: np.vstack([armazem.batimentos(r, d) for r in registros]).astype(np.float64).mean(axis=0)
+            for d in armazem.derivacoes}
+
+@pytest.mark.parametrize('selecao, registros', [
+    (None, [0, 1, 2]), (1, [1]), (np.int64(2), [2]), ([0, 2], [0, 2]),
+    (np.array([True, False, True]), [0, 2]),
+])
+def test_prototipos_sem_rotulos(tmp_path, selecao, registros):
+    armazem = _armazem(tmp_path, None)
+    esperado = _media(armazem, registros)
+    for d, template in armazem.prototipos(selecao).items():
+        np.testing.assert_allclose(template, esperado[d], rtol=1e-6)
+
+def test_prototipos_por_rotulo(tmp_path):
+    armazem = _armazem(tmp_path, [0, 1, 0])
+    esperado = _media(armazem, [0, 2])
+    for d, template in armazem.prototipos(0).items():
+        np.testing.assert_allclose(template, esperado[d], rtol=1e-6)
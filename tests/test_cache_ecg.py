@@ -0,0 +1,32 @@
+import os
+import numpy as np
+from cache_ecg import CacheECG
+
+def _tamanho_em_disco(diretorio):
+    return sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in os.listdir(diretorio))
+
+def test_limite_e_total_em_memoria(tmp_path, monkeypatch):
+    varreduras = []
+    entradas = CacheECG._entradas
+    monkeypatch.setattr(CacheECG, '_entradas', lambda self: varreduras.append(1) or entradas(self))
+
+    cache = CacheECG(str(tmp_path), tamanho_max_mb=0.1)
+    entrada = {'x': np.zeros(1000)}  # ~8 KB por arquivo
+    for i in range(40):
+        cache.salvar(f'chave{i}', entrada)
+        assert cache.tamanho == _tamanho_em_disco(tmp_path)
+        assert cache.tamanho <= cache.tamanho_max
+
+    # Sobrescrever uma entrada não muda o total
+    cache.salvar('chave39', entrada)
+    assert cache.tamanho == _tamanho_em_disco(tmp_path)
+
+    # Uma varredura na criação e uma a cada remoção, e não uma por gravação
+    assert cache.remocoes > 0
+    assert 1 < len(varreduras) < 40
+    assert cache.obter('chave39') is not None
+    assert cache.obter('chave0') is None
+
+def test_total_inicial_considera_entradas_existentes(tmp_path):
+    CacheECG(str(tmp_path)).salvar('a', {'x': np.ones(100)})
+    assert CacheECG(str(tmp_path)).tamanho == _tamanho_em_disco(tmp_path)
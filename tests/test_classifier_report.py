@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from classifier_report import (CLASSES, acuracia_regras, avalia_distancias, classificar_com_base_nas_distancias,
+                               votacao_final, votacao_lote)
+
+DERIVACOES = ['V1', 'V2', 'V3', 'V4']
+
+def _distancias(n=40, seed=0):
+    # Distâncias (registros x classes x derivações) com empates de votos e de distâncias
+    rng = np.random.default_rng(seed)
+    distancias = rng.integers(0, 4, size=(n, len(CLASSES), len(DERIVACOES))).astype(np.float64)
+    rotulos = rng.integers(0, len(CLASSES), size=n)
+    return distancias, rotulos
+
+def test_votacao_lote_igual_a_votacao_final():
+    distancias, _ = _distancias()
+    rotulos = votacao_lote(distancias)['rotulos']
+    for registro, rotulo in zip(distancias, rotulos):
+        dist_normal, dist_ami = (dict(zip(DERIVACOES, d)) for d in registro)
+        classificacoes = classificar_com_base_nas_distancias(dist_normal, dist_ami)
+        assert CLASSES[rotulo] == votacao_final(classificacoes, dist_normal, dist_ami)
+
+def test_rotulos_em_dataframe():
+    # Rótulos como vêm de divide_treino_teste (DataFrame com a coluna 'label')
+    distancias, rotulos = _distancias()
+    y = pd.DataFrame({'label': rotulos})[['label']]
+    esperado = (votacao_lote(distancias)['rotulos'] == rotulos).mean()
+
+    pesos = np.ones((3, len(DERIVACOES)))
+    np.testing.assert_allclose(acuracia_regras(distancias, y, pesos), esperado)
+    np.testing.assert_allclose(acuracia_regras(distancias, y['label'], pesos), esperado)
+
+    y_pred = avalia_distancias(distancias, y, graficos=False)
+    assert len(y_pred) == len(rotulos)
+    np.testing.assert_array_equal(y_pred['label'], rotulos)
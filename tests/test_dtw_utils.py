@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from dtw_utils import DTW, DTW_banda, _acumula_antidiagonais, _largura_banda
+
+def _dtw_na_banda(s, t, janela):
+    # Referência: recorrência completa com custo infinito fora da banda |i - j| <= janela
+    custo = (s[:, None] - t[None, :]) ** 2
+    i, j = np.indices(custo.shape)
+    custo[np.abs(i - j) > janela] = np.inf
+    return _acumula_antidiagonais(custo)
+
+@pytest.mark.parametrize('n, m', [(1, 1), (1, 5), (5, 1), (30, 40), (40, 30), (120, 120)])
+@pytest.mark.parametrize('fracao', [None, 0.05, 0.1, 0.3])
+def test_dtw_banda_igual_a_recorrencia_na_banda(n, m, fracao):
+    rng = np.random.default_rng(n * m)
+    s, t = rng.standard_normal(n).cumsum(), rng.standard_normal(m).cumsum()
+    janela = _largura_banda(n, m, fracao=fracao)
+    assert DTW_banda(s, t, fracao=fracao) == pytest.approx(_dtw_na_banda(s, t, janela), rel=1e-12)
+    if fracao is None:
+        assert DTW_banda(s, t) == pytest.approx(DTW(s, t), rel=1e-12)
+
+def test_dtw_banda_abandono_antecipado():
+    rng = np.random.default_rng(0)
+    s, t = rng.standard_normal((2, 200)).cumsum(axis=1)
+    distancia = DTW_banda(s, t, fracao=0.1)
+    assert DTW_banda(s, t, fracao=0.1, limite=1.01 * distancia) == pytest.approx(distancia)
+    assert DTW_banda(s, t, fracao=0.1, limite=0.99 * distancia) == np.inf
+
+    # Uma cauda de zeros (limite inferior trivial) não muda o resultado
+    cauda = np.zeros(len(s) + 1)
+    assert DTW_banda(s, t, fracao=0.1, limite=1.01 * distancia, cauda=cauda) == pytest.approx(distancia)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from ecg_preprocessing import (bandpass_filter, banco_filtros, clean_ECG_multicanal, detect_qrs, detect_qrs_multicanal,
+                               highpass_filter, notch_filter)
+
+# O banco SOS (sosfiltfilt) não é bit a bit igual ao filtfilt com (b, a): a diferença fica
+# abaixo de 1e-5 em sinais normalizados (o maior erro é o do passa-altas), então é essa a
+# tolerância usada aqui
+TOLERANCIA_SOS = 1e-5
+
+@pytest.mark.parametrize('seed', range(6))
+def test_detect_qrs_multicanal_igual_a_detect_qrs_por_derivacao(ecg, seed):
+    ECG_clean = clean_ECG_multicanal(ecg(seed=seed), [0, 1, 2, 3])
+    picos, integrado = detect_qrs_multicanal(ECG_clean)
+
+    for c in range(ECG_clean.shape[1]):
+        picos_c, integrado_c = detect_qrs(ECG_clean[:, c])
+        np.testing.assert_array_equal(picos[c], picos_c)
+        np.testing.assert_allclose(integrado[:, c], integrado_c, atol=TOLERANCIA_SOS)
+
+def test_banco_filtros_dentro_da_tolerancia(ecg):
+    sinal = ecg(seed=1)
+    banco = banco_filtros(500)
+    np.testing.assert_allclose(banco.highpass(sinal, axis=0), highpass_filter(sinal, axis=0), atol=TOLERANCIA_SOS)
+    np.testing.assert_allclose(banco.notch(sinal, axis=0), notch_filter(sinal, axis=0), atol=TOLERANCIA_SOS)
+    np.testing.assert_allclose(banco.bandpass(sinal, axis=0), bandpass_filter(sinal, axis=0), atol=TOLERANCIA_SOS)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from ecg_streaming import DetectorQRSStreaming, blocos
+
+def _batimentos(sinal, tamanho):
+    # Todos os batimentos do sinal processado em blocos de `tamanho` amostras, incluindo
+    # os emitidos por finaliza(), em ordem de posição e canal
+    detector = DetectorQRSStreaming()
+    saida = []
+    for bloco in blocos(sinal, tamanho):
+        saida += detector.processa(bloco)
+    saida += detector.finaliza()
+    return sorted(saida, key=lambda b: (b[1], b[0]))
+
+@pytest.mark.parametrize('tamanho', [1, 37, 1000, 5000])
+def test_saida_independente_do_tamanho_dos_blocos(ecg, tamanho):
+    sinal = ecg(segundos=20, seed=3)
+    referencia = _batimentos(sinal, 250)
+    saida = _batimentos(sinal, tamanho)
+
+    assert len(referencia) > 0
+    assert [(c, centro) for c, centro, _ in saida] == [(c, centro) for c, centro, _ in referencia]
+    for (_, _, beat), (_, _, beat_ref) in zip(saida, referencia):
+        np.testing.assert_array_equal(beat, beat_ref)
+
+def test_finaliza_emite_picos_pendentes(ecg):
+    # Corta o sinal logo depois da metade direita de um batimento: o pico dele ainda está
+    # no período refratário, então só finaliza() o emite
+    sinal = ecg(segundos=12, seed=4)
+    canal, centro, beat = _batimentos(sinal, 250)[-1]
+    detector = DetectorQRSStreaming()
+    cortado = sinal[:centro + detector.half_window + 10]
+
+    emitidos = []
+    for bloco in blocos(cortado, 250):
+        emitidos += detector.processa(bloco)
+    assert (canal, centro) not in [(c, x) for c, x, _ in emitidos]
+
+    finais = detector.finaliza()
+    encontrados = [b for c, x, b in finais if (c, x) == (canal, centro)]
+    assert len(encontrados) == 1
+    np.testing.assert_array_equal(encontrados[0], beat)
+    assert detector.finaliza() == []
@@ -0,0 +1,13 @@
+import pytest
+import main
+
+@pytest.mark.parametrize('distancias, esperado', [
+    ({'NORMAL': 1.0, 'AMI': 2.0}, 'NORMAL'),
+    ({'NORMAL': 2.0, 'AMI': 1.0}, 'AMI'),
+    ({'NORMAL': 1.0, 'AMI': 1.0}, 'AMI'),   # Empate: a última classe, como nos demais métodos
+    ({'AMI': 1.0, 'NORMAL': 1.0}, 'AMI'),
+])
+def test_dependente_desempata_pela_ultima_classe(monkeypatch, distancias, esperado):
+    monkeypatch.setattr(main, 'cria_template', lambda **kwargs: {})
+    monkeypatch.setattr(main, 'calcular_distancias_dtw_dependente', lambda *args, **kwargs: (distancias, 0.0))
+    assert main.classifica_registro('registro', {}, metodo='dependente')[0] == esperado
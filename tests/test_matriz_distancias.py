@@ -0,0 +1,39 @@
+import json
+import os
+import numpy as np
+import pytest
+from dtw_utils import DTW_vetorizado
+from matriz_distancias import matriz_distancias
+
+def _batimentos(n=7, amostras=30, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, amostras)).cumsum(axis=1)
+
+def _referencia(batimentos):
+    return np.array([[DTW_vetorizado(x, y) for y in batimentos] for x in batimentos])
+
+def test_matriz_completa_e_retomada(tmp_path):
+    batimentos = _batimentos()
+    arquivo = str(tmp_path / 'd.npy')
+    matriz = matriz_distancias(batimentos, arquivo, engine='lote', tamanho_bloco=3)
+    np.testing.assert_allclose(matriz, _referencia(batimentos), rtol=1e-10)
+
+    # Execução interrompida: células apagadas voltam a ser calculadas
+    matriz[0, 4] = matriz[4, 0] = np.nan
+    matriz.flush()
+    del matriz
+    np.testing.assert_allclose(matriz_distancias(batimentos, arquivo, engine='lote', tamanho_bloco=3),
+                               _referencia(batimentos), rtol=1e-10)
+
+    with pytest.raises(ValueError):
+        matriz_distancias(_batimentos(seed=1), arquivo, engine='lote', tamanho_bloco=3)
+
+def test_sem_assinatura_recalcula(tmp_path):
+    batimentos = _batimentos()
+    arquivo = str(tmp_path / 'd.npy')
+    np.save(arquivo, np.zeros((len(batimentos), len(batimentos))))  # .npy sem o .json
+
+    matriz = matriz_distancias(batimentos, arquivo, engine='lote', tamanho_bloco=3)
+    np.testing.assert_allclose(matriz, _referencia(batimentos), rtol=1e-10)
+    assert os.path.exists(str(tmp_path / 'd.json'))
+    with open(tmp_path / 'd.json') as f:
+        assert json.load(f)['engine'] == 'lote'
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from classifier_report import classificar_com_base_nas_distancias, votacao_final
+from dtw_utils import DTW_vetorizado
+from servico_classificacao import ClassificadorServico
+
+DERIVACOES = ['V1', 'V2', 'V3', 'V4']
+
+def _prototipos(seed=0):
+    rng = np.random.default_rng(seed)
+    return {c: {d: rng.standard_normal(40).cumsum() for d in DERIVACOES} for c in ('NORMAL', 'AMI')}
+
+@pytest.mark.parametrize('metodo', ['fastdtw', 'dependente', 'qualquer'])
+def test_rejeita_metodo_nao_suportado(metodo):
+    with pytest.raises(ValueError):
+        ClassificadorServico(_prototipos(), n_threads=1, metodo=metodo)
+
+def test_rejeita_outras_classes():
+    prototipos = _prototipos()
+    prototipos['OUTRA'] = prototipos['AMI']
+    with pytest.raises(ValueError):
+        ClassificadorServico(prototipos, n_threads=1)
+
+@pytest.mark.parametrize('metodo', ['dtw', 'poda'])
+def test_classifica_como_votacao_final(metodo):
+    # Protótipos em ordem invertida: a ordem das classes não pode mudar os desempates
+    prototipos = dict(reversed(list(_prototipos().items())))
+    servico = ClassificadorServico(prototipos, n_threads=1, metodo=metodo)
+    rng = np.random.default_rng(1)
+    try:
+        for _ in range(5):
+            batimentos = {d: rng.standard_normal(40).cumsum() for d in DERIVACOES}
+            dist_normal, dist_ami = ({d: DTW_vetorizado(batimentos[d], prototipos[c][d]) for d in DERIVACOES}
+                                     for c in ('NORMAL', 'AMI'))
+            classificacoes = classificar_com_base_nas_distancias(dist_normal, dist_ami)
+            resultado = servico.classifica_batimentos(batimentos)
+            assert resultado['classificacoes'] == classificacoes
+            assert resultado['label'] == votacao_final(classificacoes, dist_normal, dist_ami)
+    finally:
+        servico.encerra()